@@ -0,0 +1,57 @@
+"""Cold import cost of the SDK, measured with python -X importtime.
+
+Each statement runs in a fresh interpreter. The script fails when one of the
+heavy dependencies (web3, eth_abi, aiohttp, requests) is imported by a
+statement that should not need it, or when the import takes longer than the
+optional budget.
+
+Run with: python benchmarks/bench_import.py [budget_ms]
+"""
+import subprocess
+import sys
+
+HEAVY = ["web3", "eth_abi", "aiohttp", "requests"]
+
+STATEMENTS = [
+    "import dexible",
+    "from dexible import Price, Token, as_units",
+    "from dexible import DexibleSDK",
+    "import dexible.abi as abi; abi.ERC20_ABI",
+]
+
+CHECK = "import sys; {stmt}; " \
+    "print(','.join(m for m in {heavy} if m in sys.modules))"
+
+
+def measure(stmt):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         CHECK.format(stmt=stmt, heavy=HEAVY)],
+        capture_output=True, text=True, check=True)
+    total = 0
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[0].startswith("import time:"):
+            continue
+        try:
+            total += int(parts[0].split(":")[1])
+        except ValueError:
+            continue
+    loaded = [m for m in out.stdout.strip().split(",") if m]
+    return total / 1000, loaded
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    failed = False
+    for stmt in STATEMENTS:
+        ms, loaded = measure(stmt)
+        print(f"{stmt:<45} {ms:8.1f} ms  heavy: {', '.join(loaded) or '-'}")
+        if loaded or (budget is not None and ms > budget):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
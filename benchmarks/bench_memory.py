@@ -0,0 +1,45 @@
+"""Resident memory per order object.
+
+Builds N fully populated orders (tokens, prices, algo, policies) and reports
+the traced allocation per order. Run with: python benchmarks/bench_memory.py
+"""
+import sys
+import tracemalloc
+from dexible.common import Token, Price
+from dexible.algo import AlgoWrapper
+from dexible.order import DexOrder
+
+N = 20000
+
+
+def build(i):
+    token_in = Token(address=f"0x{i:040x}", decimals=18, symbol="IN",
+                     balance=10**21, allowance=10**21)
+    token_out = Token(address=f"0x{i + 1:040x}", decimals=6, symbol="OUT",
+                      balance=0, allowance=0)
+    price = Price(token_in, token_out, 10**18, 2000 * 10**6 + i)
+    algo = AlgoWrapper().create(type="Limit",
+                                price=price,
+                                gas_policy={"type": "relative",
+                                            "deviation": 0},
+                                slippage_percent=0.5,
+                                expiration=3600)
+    return DexOrder(api_client=None, token_in=token_in, token_out=token_out,
+                    amount_in=10**18, algo=algo, max_rounds=None,
+                    tags=[{"name": "client_order_id", "value": str(i)}],
+                    quote_id=1)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else N
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    orders = [build(i) for i in range(n)]
+    after = tracemalloc.take_snapshot()
+    used = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    print(f"{n} orders: {used / n:.0f} bytes per order")
+    return orders
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Request throughput of DexibleSyncSDK against DexibleSDK.
+
+Serves canned order records from a local keep-alive HTTP server (pointed to
+with API_BASE_URL) and times N order lookups: sequentially with the sync SDK,
+sequentially with the async SDK, and concurrently with the async SDK.
+
+Run with: python benchmarks/bench_sdk_modes.py [count] [concurrency]
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from eth_account import Account
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        order_id = self.path.rsplit("/", 1)[-1]
+        body = json.dumps({"id": order_id, "state": "active"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms "
+          f"{count / elapsed:10.0f} requests/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["API_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    from dexible import DexibleSDK, DexibleSyncSDK
+    account = Account.create()
+
+    with DexibleSyncSDK(None, account, 1) as sync_sdk:
+        timed("sync, sequential",
+              lambda: [sync_sdk.order.get_one(i) for i in range(count)],
+              count)
+
+    # each asyncio.run() gets its own loop, so each gets its own SDK, closed
+    # before the loop is
+    async def sequential():
+        async with DexibleSDK(None, account, 1) as async_sdk:
+            for i in range(count):
+                await async_sdk.order.get_one(i)
+
+    async def concurrent():
+        limit = asyncio.Semaphore(concurrency)
+
+        async with DexibleSDK(None, account, 1) as async_sdk:
+            async def one(i):
+                async with limit:
+                    await async_sdk.order.get_one(i)
+            await asyncio.gather(*[one(i) for i in range(count)])
+
+    timed("async, sequential", lambda: asyncio.run(sequential()), count)
+    timed(f"async, {concurrency} concurrent",
+          lambda: asyncio.run(concurrent()), count)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
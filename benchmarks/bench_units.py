@@ -0,0 +1,56 @@
+"""Scalar as_units/as_decs loops against the array versions.
+
+Run with: python benchmarks/bench_units.py [count]
+"""
+import sys
+import time
+from decimal import Decimal
+from dexible.common import as_units, as_decs, as_units_array, as_decs_array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:9.1f} ms "
+          f"{count / elapsed:12.0f} values/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    decimals = [Decimal(i) / 7 for i in range(count)]
+    ints = list(range(count))
+    wei = [i * 10**18 + 123456789 for i in range(count)]
+    per_element = [6 if i % 2 else 18 for i in range(count)]
+
+    timed("as_units loop (Decimal)",
+          lambda: [as_units(v, 18) for v in decimals], count)
+    timed("as_units_array (Decimal)",
+          lambda: as_units_array(decimals, 18), count)
+    timed("as_units loop (int)",
+          lambda: [as_units(v, 18) for v in ints], count)
+    timed("as_units_array (int)",
+          lambda: as_units_array(ints, 18), count)
+    timed("as_units_array (int, per-element units)",
+          lambda: as_units_array(ints, per_element), count)
+    timed("as_decs loop",
+          lambda: [as_decs(v, 18) for v in wei], count)
+    timed("as_decs_array",
+          lambda: as_decs_array(wei, 18), count)
+    timed("as_decs_array (float)",
+          lambda: as_decs_array(wei, 18, as_float=True), count)
+    if numpy is not None:
+        arr = numpy.arange(count, dtype=numpy.int64)
+        timed("as_units_array (numpy int64)",
+              lambda: as_units_array(arr, 18), count)
+        timed("as_decs_array (numpy int64, float)",
+              lambda: as_decs_array(arr, 6, as_float=True), count)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(name="dexible",
 	  packages=["dexible", "dexible.abi"],
@@ -24,16 +24,18 @@ setup(name="dexible",
 	  		"aiohttp",
 	  		"requests",
 	  ],
+	  extras_require={
+	  		# dexible.report_table, dexible.simulate and dexible.backtest
+	  		"analytics": ["numpy"],
+	  },
 	  classifiers=[
 	  		"Development Status :: 5 - Production/Stable",
 	  		"License :: OSI Approved :: MIT License",
 	  		"Programming Language :: Python :: 3",
-	  		"Programming Language :: Python :: 3.5",
-	  		"Programming Language :: Python :: 3.6",
 	  		"Programming Language :: Python :: 3.7",
 	  		"Programming Language :: Python :: 3.8",
 	  		"Programming Language :: Python :: 3.9",
 	  		"Programming Language :: Python :: 3.10",
 	  ],
-	  python_requires=">=3.5",
+	  python_requires=">=3.7",
 )
@@ -1,2 +1,31 @@
-from .sdk import DexibleSDK, Dexible, Order
-from .common import Price, Token, as_units
\ No newline at end of file
+import importlib
+
+# Public names are resolved on first access, so `import dexible` stays cheap
+# and web3, eth_abi, aiohttp and requests load only with the parts that use
+# them.
+_EXPORTS = {
+    "DexibleSDK": ".sdk",
+    "Dexible": ".sdk",
+    "Order": ".sdk",
+    "DexibleSyncSDK": ".sync",
+    "AccountPool": ".pool",
+    "ChainRouter": ".router",
+    "ApprovalPlanner": ".approvals",
+    "Price": ".common",
+    "Token": ".common",
+    "as_units": ".common",
+}
+
+__all__ = list(_EXPORTS.keys())
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(__all__))
@@ -1,18 +1,24 @@
 import os
 import json
 
-DEXIBLE_ABI = None
-ERC20_ABI = None
-MULTICALL_ABI = None
-
+# ABIs are parsed on first access: abi.ERC20_ABI, or from .abi import ERC20_ABI
+_FILES = {
+	"DEXIBLE_ABI": "Dexible.json",
+	"ERC20_ABI": "ERC20ABI.json",
+	"MULTICALL_ABI": "Multicall.json",
+}
 
 __dir = os.path.dirname(__file__)
 
-with open(os.path.join(__dir, 'Dexible.json'), 'r') as f:
-	DEXIBLE_ABI = json.load(f)
 
-with open(os.path.join(__dir, 'ERC20ABI.json'), 'r') as f:
-	ERC20_ABI = json.load(f)
+def __getattr__(name):
+	if name not in _FILES:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	with open(os.path.join(__dir, _FILES[name]), 'r') as f:
+		value = json.load(f)
+	globals()[name] = value
+	return value
+
 
-with open(os.path.join(__dir, 'Multicall.json'), 'r') as f:
-	MULTICALL_ABI = json.load(f)
+def __dir__():
+	return sorted(set(globals().keys()) | set(_FILES.keys()))
@@ -3,27 +3,135 @@ from datetime import timedelta
 import logging
 import dexible.policy as policy
 from .exceptions import DexibleAlgoException
-from .common import Price
+from .common import Memoizable, Price, json_fragment
 
 log = logging.getLogger('DexAlgo')
 
 
-class DexibleBaseAlgorithm:
-    name = None
-    policies = None
-    max_rounds = 0
+class PolicySchema:
+    """Policy requirements of an algorithm type.
+
+    Built once per algorithm class, or once per requirement list through
+    for_required(); validate() checks a policy list in a single pass and
+    reports every problem rather than only the first.
+    """
+    # Every algorithm must have at least Gas Cost and Slippage
+    MANDATORY = (policy.GasCost.tag, policy.Slippage.tag)
+
+    def __init__(self, required=()):
+        self.required = tuple(required)
+        # one bit per policy tag the schema looks for
+        self.rules = {}
+        for tag in self.MANDATORY + self.required:
+            self.rules.setdefault(tag, 1 << len(self.rules))
+        self.mandatory = self.rules[self.MANDATORY[0]] | \
+            self.rules[self.MANDATORY[1]]
+        self.complete = (1 << len(self.rules)) - 1
+
+    _cache = {}
+
+    @classmethod
+    def for_required(cls, required):
+        """Shared schema for a list of required policy tags."""
+        required = tuple(required)
+        schema = cls._cache.get(required)
+        if schema is None:
+            schema = cls._cache[required] = cls(required)
+        return schema
+
+    def validate(self, policies):
+        errors = []
+        rules = self.rules
+        found = 0
+        seen = set()
+        duplicates = set()
+        for p in policies:
+            name = p.name
+            if name in seen:
+                if name not in duplicates:
+                    duplicates.add(name)
+                    errors.append("Found duplicate policy definition: " +
+                                  name)
+            else:
+                seen.add(name)
+                found |= rules.get(name, 0)
+
+            err = p.verify()
+            if err is not None:
+                errors.append(err)
+
+        if found != self.complete:
+            missing = [r for r in self.required if not found & rules[r]]
+            if len(missing) > 0:
+                errors.append(f"Must have following policies: {missing}")
+            if found & self.mandatory != self.mandatory:
+                errors.append(
+                    "Must have at least GasCost and Slippage policies")
+        return errors
+
+
+class DexibleBaseAlgorithm(Memoizable):
+    __slots__ = ("name", "policies", "max_rounds")
+    policy_schema = PolicySchema.for_required(())
 
     def __init__(self, policies, name, max_rounds=0, *args, **kwargs):
         self.policies = policies
         self.name = name
         self.max_rounds = max_rounds
 
+    def _children(self):
+        return tuple(self.policies)
+
     def verify(self):
-        return self.verify_policies([])
+        """Returns None when the algo's policies are valid, otherwise a
+        message listing every problem found.
+        """
+        errors = self.errors()
+        if len(errors) == 0:
+            return None
+        return "; ".join(errors)
+
+    def errors(self):
+        """All validation errors for this algo. The result is cached until
+        the algo or one of its policies changes, so unchanged algos are not
+        validated again.
+        """
+        return list(self._memoized("errors", self._validate))
+
+    def _validate(self):
+        errors = self.policy_schema.validate(self.policies)
+        if len(errors) > 0:
+            log.debug(f"Policy verification failed for {self.name}: "
+                      f"{errors}")
+        return errors
 
     def serialize(self):
-        return {"algorithm": self.name,
-                "policies": [p.serialize() for p in self.policies]}
+        """Serialized form of the algo. Cached until the algo or one of its
+        policies changes, so treat the result as read-only.
+        """
+        return self._memoized("serialize", lambda: {
+            "algorithm": self.name,
+            "policies": [p.serialize() for p in self.policies]})
+
+    def policies_json(self):
+        """Serialized policies as a JSON array, assembled from each
+        policy's cached JSON fragment.
+        """
+        return self._memoized("policies_json", lambda: b"[" + b", ".join(
+            [p.serialize_json() for p in self.policies]) + b"]")
+
+    def serialize_json(self):
+        """serialize() pre-encoded as JSON bytes."""
+        return self._memoized("serialize_json", lambda:
+                              b'{"algorithm": ' + json_fragment(self.name) +
+                              b', "policies": ' + self.policies_json() + b"}")
+
+    def find_policy(self, cls):
+        """The algo's first policy of class cls, or None."""
+        for p in self.policies:
+            if isinstance(p, cls):
+                return p
+        return None
 
     def get_slippage(self):
         slippages = list(
@@ -34,45 +142,10 @@ class DexibleBaseAlgorithm:
             return slippages[0].amount
 
     def verify_policies(self, required=[]):
-        # Must have at least Gas Cost and Slippage
-        has_gas = False
-        has_slippage = False
-        # Must not have duplicate policies
-        dup_check = []
-
-        req_matches = []
-        log.debug(f"Verifying policies: {self.name}")
-        for p in self.policies:
-            log.debug(f" Checking policy: {p.name}")
-            if p.name in dup_check:
-                return "Found duplicate policy definition: " + p.name
-            dup_check.append(p.name)
-
-            if p.name == policy.GasCost.tag:
-                has_gas = True
-            elif p.name == policy.Slippage.tag:
-                has_slippage = True
-
-            err = p.verify()
-            if err is not None:
-                log.error(f"Policy verification failed: {err}")
-                return err
-
-            if p.name in required:
-                req_matches.append(p.name)
-
-        if len(required) != len(req_matches):
-            log.debug(f"Required and matches don't match. "
-                      f"Required: {required}; Provided: {req_matches}")
-            missing = list(
-                filter(lambda req: req not in req_matches, required))
-            return f"Must have following policies: {missing}"
-
-        if has_gas and has_slippage:
-            log.debug("All policies verified")
+        errors = PolicySchema.for_required(required).validate(self.policies)
+        if len(errors) == 0:
             return None
-
-        return "Must have at least GasCost and Slippage policies"
+        return "; ".join(errors)
 
     def __str__(self):
         return f"<Algo {self.name} policies: {self.policies}>"
@@ -81,16 +154,16 @@ class DexibleBaseAlgorithm:
 
 class Limit(DexibleBaseAlgorithm):
     tag = "Limit"
+    __slots__ = ()
+    policy_schema = PolicySchema.for_required([policy.LimitPrice.tag])
 
     def __init__(self, *args, **kwargs):
         super(Limit, self).__init__(name=self.tag, *args, **kwargs)
 
-    def verify(self):
-        return self.verify_policies([policy.LimitPrice.tag])
-
 
 class Market(DexibleBaseAlgorithm):
     tag = "Market"
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
         super(Market, self).__init__(name=self.tag, *args, **kwargs)
@@ -98,22 +171,103 @@ class Market(DexibleBaseAlgorithm):
 
 class StopLoss(DexibleBaseAlgorithm):
     tag = "StopLoss"
+    __slots__ = ()
+    policy_schema = PolicySchema.for_required([policy.StopPrice.tag])
 
     def __init__(self, *args, **kwargs):
         super(StopLoss, self).__init__(name=self.tag, *args, **kwargs)
 
-    def verify(self):
-        return self.verify_policies([policy.StopPrice.tag])
-
 
 class TWAP(DexibleBaseAlgorithm):
     tag = "TWAP"
+    __slots__ = ()
+    policy_schema = PolicySchema.for_required([policy.BoundedDelay.tag])
 
     def __init__(self, *args, **kwargs):
         super(TWAP, self).__init__(name=self.tag, *args, **kwargs)
 
-    def verify(self):
-        return self.verify_policies([policy.BoundedDelay.tag])
+
+ALGO_TYPES = {cls.tag: cls for cls in [Limit, Market, StopLoss, TWAP]}
+
+
+def from_json(name, policies, max_rounds=0):
+    """Rebuild an algorithm from the serialized form found in order records.
+
+    Args:
+        name (str): Algorithm tag, e.g. "Limit".
+        policies (list): Serialized policies.
+        max_rounds (int): Optional max rounds of the order.
+    """
+    cls = ALGO_TYPES.get(name)
+    if cls is None:
+        raise DexibleAlgoException(f"Unsupported algorithm type: {name}")
+    return cls(policies=[policy.from_json(p) for p in policies],
+               max_rounds=max_rounds or 0)
+
+
+class AlgoTemplate:
+    """Pre-validated algo settings for generating many similar algos.
+
+    Everything except the price-type fields is parsed and turned into
+    policies once. Frozen copies of the resulting policies are shared by
+    every algo the template creates, so policy objects passed in by the
+    caller stay modifiable; create() only builds the per-order price
+    policy.
+    """
+    # per-order fields for each algorithm type
+    PRICE_FIELDS = {Limit.tag: ["price"],
+                    Market.tag: [],
+                    StopLoss.tag: ["trigger_price"],
+                    TWAP.tag: ["price_range"]}
+
+    def __init__(self, wrapper, *args, **kwargs):
+        _type = kwargs.pop("type")
+        if isinstance(_type, Enum):
+            _type = _type.value
+        if _type not in ALGO_TYPES:
+            raise DexibleAlgoException(f"Unsupported algorithm type: {_type}")
+        self.wrapper = wrapper
+        self.algo_class = ALGO_TYPES[_type]
+        self.max_rounds = kwargs.get("max_rounds", 0)
+        self.defaults = {k: kwargs[k]
+                         for k in self.PRICE_FIELDS[_type] if k in kwargs}
+
+        shared = wrapper._build_base_polices(*args, **kwargs)
+        if self.algo_class == StopLoss:
+            self.is_above = wrapper._check_is_above(**kwargs)
+        elif self.algo_class == TWAP:
+            shared.append(wrapper._build_bounded_delay(**kwargs))
+        self.shared_policies = []
+        for p in shared:
+            p = p.copy()
+            p.freeze()
+            self.shared_policies.append(p)
+
+    def create(self, **overrides):
+        """Create an algo from the template.
+
+        Args:
+            overrides: Price-type fields for this order only: price for
+                Limit, trigger_price for StopLoss, price_range for TWAP.
+                Defaults to the values given to the template.
+        """
+        fields = self.PRICE_FIELDS[self.algo_class.tag]
+        for k in overrides:
+            if k not in fields:
+                raise DexibleAlgoException(
+                    f"{k} cannot be overridden for {self.algo_class.tag} "
+                    f"algos, only {fields}")
+        kwargs = dict(self.defaults, **overrides)
+
+        policies = list(self.shared_policies)
+        if self.algo_class == Limit:
+            policies.append(self.wrapper._build_limit_price(**kwargs))
+        elif self.algo_class == StopLoss:
+            policies.append(self.wrapper._build_stop_price(
+                is_above=self.is_above, **kwargs))
+        elif self.algo_class == TWAP and "price_range" in kwargs:
+            policies.append(self.wrapper._build_price_range(**kwargs))
+        return self.algo_class(policies=policies, max_rounds=self.max_rounds)
 
 
 class AlgoWrapper:
@@ -141,16 +295,8 @@ class AlgoWrapper:
             raise DexibleAlgoException(f"Unsupported algorithm type: {_type}")
 
     def create_limit(self, *args, **kwargs):
-        # Invert price since quote are in output tokens while prices are
-        # expressed in input tokens
-        if "price" not in kwargs:
-            raise DexibleAlgoException("price is required")
-        price = kwargs.get("price")
-        if type(price) != Price:
-            raise DexibleAlgoException(
-                "price must be of type dexible.common.Price")
         policies = self._build_base_polices(*args, **kwargs) + \
-            [policy.LimitPrice(price=price)]
+            [self._build_limit_price(**kwargs)]
 
         return Limit(policies=policies, *args, **kwargs)
 
@@ -159,25 +305,54 @@ class AlgoWrapper:
                       *args, **kwargs)
 
     def create_stop_loss(self, *args, **kwargs):
-        if "trigger_price" not in kwargs:
-            raise DexibleAlgoException("trigger_price is required")
-        trigger_price = kwargs.get("trigger_price")
-        if type(trigger_price) != Price:
+        policies = self._build_base_polices(*args, **kwargs) + \
+            [self._build_stop_price(**kwargs)]
+        return StopLoss(policies=policies, *args, **kwargs)
+
+    def create_twap(self, *args, **kwargs):
+        policies = self._build_base_polices(*args, **kwargs) + \
+            [self._build_bounded_delay(**kwargs)]
+
+        if "price_range" in kwargs:
+            policies.append(self._build_price_range(**kwargs))
+        return TWAP(policies=policies, *args, **kwargs)
+
+    def template(self, *args, **kwargs):
+        """Validate settings once and return an AlgoTemplate producing algos
+        of the given type. Takes the same arguments as create().
+        """
+        return AlgoTemplate(self, *args, **kwargs)
+
+    def _build_limit_price(self, **kwargs):
+        # Invert price since quote are in output tokens while prices are
+        # expressed in input tokens
+        if "price" not in kwargs:
+            raise DexibleAlgoException("price is required")
+        price = kwargs.get("price")
+        if type(price) != Price:
             raise DexibleAlgoException(
-                "trigger_price must be of type dexible.common.Price")
+                "price must be of type dexible.common.Price")
+        return policy.LimitPrice(price=price)
 
+    def _check_is_above(self, **kwargs):
         if "is_above" not in kwargs:
             raise DexibleAlgoException("is_above is required")
         is_above = kwargs.get("is_above")
         if type(is_above) != bool:
             raise DexibleAlgoException("is_above must be of type bool")
+        return is_above
 
-        policies = self._build_base_polices(*args, **kwargs) + \
-            [policy.StopPrice(trigger=trigger_price,
-                              above=is_above)]
-        return StopLoss(policies=policies, *args, **kwargs)
+    def _build_stop_price(self, **kwargs):
+        if "trigger_price" not in kwargs:
+            raise DexibleAlgoException("trigger_price is required")
+        trigger_price = kwargs.get("trigger_price")
+        if type(trigger_price) != Price:
+            raise DexibleAlgoException(
+                "trigger_price must be of type dexible.common.Price")
+        return policy.StopPrice(trigger=trigger_price,
+                                above=self._check_is_above(**kwargs))
 
-    def create_twap(self, *args, **kwargs):
+    def _build_bounded_delay(self, **kwargs):
         if "time_window" not in kwargs:
             raise DexibleAlgoException("time_window is required")
         time_window = kwargs.get("time_window")
@@ -200,30 +375,28 @@ class AlgoWrapper:
             raise DexibleAlgoException(
                 "expire_after_time_window must be of type bool")
 
-        policies = self._build_base_polices(*args, **kwargs) + \
-            [policy.BoundedDelay(
-                randomize_delay=randomize_delay,
-                time_window_seconds=time_window_seconds,
-                expire_after_time_window=expire_after_time_window)]
         log.debug(f"Parsed TWAP duration in seconds: {time_window_seconds}")
-
-        if "price_range" in kwargs:
-            price_range = kwargs.get("price_range")
-            if type(price_range) == dict:
-                price_range = policy.PriceBounds(
-                    base_price=price_range.get("base_price"),
-                    lower_bound_percent=price_range.get("lower_bound_percent"),
-                    upper_bound_percent=price_range.get("upper_bound_percent"))
-            elif type(price_range) == policy.PriceBounds:
-                pass
-            else:
-                raise DexibleAlgoException(
-                    "price_range must be of type "
-                    "dexible.policy.PriceBounds or dict")
-            # invert price since quotes are in output tokens while prices are
-            # expressed in input tokens
-            policies.append(price_range)
-        return TWAP(policies=policies, *args, **kwargs)
+        return policy.BoundedDelay(
+            randomize_delay=randomize_delay,
+            time_window_seconds=time_window_seconds,
+            expire_after_time_window=expire_after_time_window)
+
+    def _build_price_range(self, **kwargs):
+        price_range = kwargs.get("price_range")
+        if type(price_range) == dict:
+            price_range = policy.PriceBounds(
+                base_price=price_range.get("base_price"),
+                lower_bound_percent=price_range.get("lower_bound_percent"),
+                upper_bound_percent=price_range.get("upper_bound_percent"))
+        elif type(price_range) == policy.PriceBounds:
+            pass
+        else:
+            raise DexibleAlgoException(
+                "price_range must be of type "
+                "dexible.policy.PriceBounds or dict")
+        # invert price since quotes are in output tokens while prices are
+        # expressed in input tokens
+        return price_range
 
     def _build_base_polices(self, *args, **kwargs):
         if "gas_policy" not in kwargs:
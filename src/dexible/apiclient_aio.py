@@ -1,3 +1,4 @@
+import asyncio
 import os
 import logging
 import json
@@ -19,8 +20,22 @@ DEFAULT_BASE_ENDPOINT = "api.dexible.io/v1"
 class APIClient:
     SIGNATURE_PREFIX = "Signature "
 
-    def __init__(self, account, chain_id, network='ethereum', *args, **kwargs):
+    def __init__(self, account, chain_id, network='ethereum', session=None,
+                 connection_limit=100, *args, **kwargs):
+        """
+        Args:
+            session (aiohttp.ClientSession): Optional session to send requests
+                through, e.g. one shared by an AccountPool. The caller owns
+                and closes it. By default the client opens its own pooled
+                session on first use; release it with close().
+            connection_limit (int): Maximum open connections of the client's
+                own session.
+        """
         self.account = account
+        self.session = session
+        self.connection_limit = connection_limit
+        self._own_session = None
+        self._own_loop = None
         self.network = network
         self.chain_id = chain_id
         self.chain_name = chain_to_name(self.network, self.chain_id)
@@ -153,28 +168,13 @@ class APIClient:
         log.debug(f"GET call to {url}")
         try:
             hdrs = self.make_headers(url, "get")
-            async with aiohttp.ClientSession(headers=hdrs) as session:
-                async with session.get(url) as r:
-                    json_body = await r.json()
-                    if json_body is None:
-                        raise DexibleException(
-                            message=f"Missing result in GET request: {json_body}")
-                    elif type(json_body) == dict and 'error' in json_body:
-                        log.debug(f"Problem reported from server "
-                                  f"{json_body['error']}")
-                        if 'message' in json_body['error']:
-                            errmsg = json_body['error']['message']
-                        else:
-                            errmsg = json_body['error']
-                        if 'requestId' in json_body['error']:
-                            req_id = json_body['error']['requestId']
-                        else:
-                            req_id = None
-                        raise DexibleException(
-                            message=errmsg,
-                            request_id=req_id,
-                            json_response=json_body)
-                    return json_body
+            json_body = await self._send("GET", url, hdrs)
+            if json_body is None:
+                raise DexibleException(
+                    message=f"Missing result in GET request: {json_body}")
+            elif type(json_body) == dict and 'error' in json_body:
+                self._raise_error(json_body)
+            return json_body
         except Exception as e:
             log.error("Problem in APIClient GET request ", e)
             raise
@@ -190,32 +190,65 @@ class APIClient:
             log.debug(f"Posting data: {post_data}")
 
             hdrs = self.make_headers(url, "post", data=post_data)
-            async with aiohttp.ClientSession(headers=hdrs) as session:
-                async with session.post(url, data=post_data) as r:
-                    json_body = await r.json()
-                    if json_body is None:
-                        raise DexibleException(
-                            message=f"Missing result in GET request: {json_body}")
-                    elif type(json_body) == dict and 'error' in json_body:
-                        log.debug(f"Problem reported from server "
-                                  f"{json_body['error']}")
-                        if 'message' in json_body['error']:
-                            errmsg = json_body['error']['message']
-                        else:
-                            errmsg = json_body['error']
-                        if 'requestId' in json_body['error']:
-                            req_id = json_body['error']['requestId']
-                        else:
-                            req_id = None
-                        raise DexibleException(
-                            message=errmsg,
-                            request_id=req_id,
-                            json_response=json_body)
-                    return json_body
+            json_body = await self._send("POST", url, hdrs, post_data)
+            if json_body is None:
+                raise DexibleException(
+                    message=f"Missing result in GET request: {json_body}")
+            elif type(json_body) == dict and 'error' in json_body:
+                self._raise_error(json_body)
+            return json_body
         except Exception as e:
             log.error("Problem in APIClient POST request ", e)
             raise
 
+    async def close(self):
+        """Close the session the client opened itself, if any. A session
+        passed in by the caller is left open.
+        """
+        session, self._own_session = self._own_session, None
+        self._own_loop = None
+        if session is not None and not session.closed:
+            await session.close()
+
+    def _pooled_session(self):
+        if self.session is not None:
+            return self.session
+        # an aiohttp session is bound to the loop it was created on
+        loop = asyncio.get_running_loop()
+        if self._own_session is None or self._own_session.closed or \
+                self._own_loop is not loop:
+            if self._own_session is not None and \
+                    not self._own_session.closed:
+                log.warning("Event loop changed; opening a new session. "
+                            "Call close() before leaving a loop.")
+            self._own_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit))
+            self._own_loop = loop
+        return self._own_session
+
+    async def _send(self, method, url, hdrs, data=None):
+        # keep-alive connections from one pool
+        session = self._pooled_session()
+        async with session.request(method, url, data=data,
+                                   headers=hdrs) as r:
+            return await r.json()
+
+    def _raise_error(self, json_body):
+        log.debug(f"Problem reported from server "
+                  f"{json_body['error']}")
+        if 'message' in json_body['error']:
+            errmsg = json_body['error']['message']
+        else:
+            errmsg = json_body['error']
+        if 'requestId' in json_body['error']:
+            req_id = json_body['error']['requestId']
+        else:
+            req_id = None
+        raise DexibleException(
+            message=errmsg,
+            request_id=req_id,
+            json_response=json_body)
+
     def _build_base_url(self):
         base = os.getenv("API_BASE_URL") or \
             f"https://{self.network}.{self.chain_name}.{DEFAULT_BASE_ENDPOINT}"
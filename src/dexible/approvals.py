@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from . import abi
+from .common import CHAIN_CONFIG, token_address
+from .exceptions import DexibleException
+from .token import TokenHelper, multicall_aggregate, multicall_contract
+
+log = logging.getLogger('ApprovalPlanner')
+
+MAX_ALLOWANCE = 2 ** 256 - 1
+
+
+class Approval:
+    """An allowance increase the planner decided is needed."""
+
+    def __init__(self, token, current, required, amount):
+        self.token = token
+        self.current = current
+        self.required = required
+        self.amount = amount
+        self.tx_hash = None
+        self.receipt = None
+        self.error = None
+
+    @property
+    def address(self):
+        return token_address(self.token)
+
+    def __str__(self):
+        return f"<Approval {self.address} current: {self.current}, " \
+            f"required: {self.required}, amount: {self.amount}>"
+    __repr__ = __str__
+
+
+class ApprovalPlanner:
+    """Brings the Settlement allowance of many tokens up to what a basket of
+    orders needs.
+
+    plan() reads every current allowance in one Multicall call and keeps only
+    the tokens that fall short. execute() sends the approvals back to back.
+    Nonces are assigned locally, so no transaction waits for the one before
+    it. All receipts are then awaited concurrently. Chain calls run on the
+    default executor, off the event loop.
+    """
+
+    def __init__(self, provider, account, chain_id, max_calls=500):
+        """
+        Args:
+            provider: Web3 provider.
+            account: Signing account owning the tokens.
+            chain_id (int): Chain to approve on.
+            max_calls (int): Maximum number of reads per Multicall call.
+        """
+        self.provider = provider
+        self.account = account
+        self.chain_id = chain_id
+        self.max_calls = max_calls
+        self.settlement = CHAIN_CONFIG[chain_id]["Settlement"]
+        self.nonce = None
+        self._w3 = None
+        self._erc20 = None
+
+    def _web3(self):
+        if self._w3 is None:
+            import web3
+            from web3.middleware import \
+                construct_sign_and_send_raw_middleware
+            self._w3 = web3.Web3(self.provider)
+            self._w3.middleware_onion.add(
+                construct_sign_and_send_raw_middleware(self.account))
+            self._w3.eth.default_account = self.account.address
+            self._erc20 = self._w3.eth.contract(abi=abi.ERC20_ABI)
+        return self._w3
+
+    async def _run(self, fn, *args):
+        # web3 calls block; keep them off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def allowances(self, tokens):
+        """Current Settlement allowance of each token, in Multicall calls of
+        up to max_calls reads.
+        """
+        return await self._run(self._read_allowances, tokens)
+
+    def _read_allowances(self, tokens):
+        w3 = self._web3()
+        multicall = multicall_contract(w3, self.chain_id)
+        calls = [{"abi": abi.ERC20_ABI,
+                  "contract": self._erc20,
+                  "address": token_address(t),
+                  "method": "allowance",
+                  "args": [self.account.address, self.settlement]}
+                 for t in tokens]
+        values = []
+        for i in range(0, len(calls), self.max_calls):
+            values += [d[0] for d in multicall_aggregate(
+                w3, multicall, calls[i:i + self.max_calls])]
+        return values
+
+    async def plan(self, requirements, infinite=False):
+        """Work out which approvals a set of orders needs.
+
+        Args:
+            requirements (dict): Token (address or Token) to the total amount
+                the orders will spend, in token units.
+            infinite (bool): Approve the maximum amount instead of exactly the
+                requirement.
+
+        Returns:
+            list: Approval for every token whose allowance is too low.
+        """
+        tokens = list(requirements.keys())
+        if len(tokens) == 0:
+            return []
+        current = await self.allowances(tokens)
+        plan = []
+        for token, allowance in zip(tokens, current):
+            required = requirements[token]
+            if allowance >= required:
+                continue
+            plan.append(Approval(token, allowance, required,
+                                 MAX_ALLOWANCE if infinite else required))
+        log.debug(f"{len(plan)} of {len(tokens)} tokens need approval")
+        return plan
+
+    def _first_nonce(self):
+        # One read per plan; later nonces are assigned locally. The local
+        # counter covers approvals the node does not list as pending yet.
+        # Blocking, called from _send
+        pending = self._web3().eth.get_transaction_count(
+            self.account.address, "pending")
+        if self.nonce is None or self.nonce < pending:
+            self.nonce = pending
+        return self.nonce
+
+    async def execute(self, plan, timeout=120):
+        """Send the approvals of a plan and wait for every receipt.
+
+        If sending one fails, the receipts of the approvals already sent are
+        still awaited and set on them before the send error is raised, so
+        the caller's plan shows which approvals went through.
+
+        Args:
+            plan (list): Approvals as returned by plan().
+            timeout (int): Seconds to wait for each receipt.
+
+        Returns:
+            list: The approvals with tx_hash and receipt set.
+
+        Raises:
+            DexibleException: An approval reverted or its receipt could not
+                be obtained; see the receipt and error of each approval.
+        """
+        w3 = self._web3()
+        sent = []
+        try:
+            await self._run(self._send, w3, plan, sent)
+        except Exception as e:
+            # the nonce may or may not have been used; re-read it next time
+            self.nonce = None
+            log.error(f"Sending approvals stopped after {len(sent)} of "
+                      f"{len(plan)}: {e}")
+            try:
+                await self._wait(w3, sent, timeout)
+            except Exception as wait_error:
+                log.error(f"Waiting for sent approvals failed: {wait_error}")
+            raise
+
+        failed = await self._wait(w3, plan, timeout)
+        if len(failed) > 0:
+            raise DexibleException(
+                f"Approval transactions failed for: {', '.join(failed)}",
+                json_response=[a.tx_hash.hex() for a in plan])
+        return plan
+
+    def _send(self, w3, plan, sent):
+        # Back to back on one thread: one nonce read, then local nonces
+        nonce = self._first_nonce()
+        for approval in plan:
+            contract = w3.eth.contract(
+                abi=abi.ERC20_ABI,
+                address=w3.toChecksumAddress(approval.address))
+            approval.tx_hash = contract.functions.approve(
+                self.settlement, approval.amount).transact({"nonce": nonce})
+            nonce += 1
+            self.nonce = nonce
+            sent.append(approval)
+            log.debug(f"Sent approval for {approval.address}: "
+                      f"{approval.tx_hash.hex()}")
+
+    async def _wait(self, w3, approvals, timeout):
+        # Awaits all receipts concurrently; returns the failed addresses. A
+        # receipt that cannot be obtained only fails its own approval
+        receipts = await asyncio.gather(
+            *[self._run(w3.eth.wait_for_transaction_receipt,
+                        approval.tx_hash, timeout)
+              for approval in approvals],
+            return_exceptions=True)
+
+        failed = []
+        for approval, receipt in zip(approvals, receipts):
+            TokenHelper().invalidate_cache_for(approval.address)
+            if isinstance(receipt, Exception):
+                log.error(f"No receipt for approval of {approval.address}: "
+                          f"{receipt}")
+                approval.error = receipt
+                failed.append(approval.address)
+                continue
+            approval.receipt = receipt
+            if not receipt.status:
+                failed.append(approval.address)
+            elif hasattr(approval.token, "allowance"):
+                approval.token.allowance = approval.amount
+        return failed
+
+    async def ensure(self, requirements, infinite=False, timeout=120):
+        """plan() then execute(); returns the executed approvals."""
+        plan = await self.plan(requirements, infinite=infinite)
+        if len(plan) == 0:
+            return plan
+        return await self.execute(plan, timeout=timeout)
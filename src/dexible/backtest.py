@@ -0,0 +1,253 @@
+"""Vectorized backtesting of Limit, StopLoss and TWAP configurations against
+historical price series.
+"""
+import logging
+import numpy as np
+import dexible.policy as policy
+from .algo import Limit, StopLoss, TWAP
+from .exceptions import DexibleAlgoException
+
+log = logging.getLogger('Backtest')
+
+
+def load_series(path, time_column=0, price_column=1):
+    """Load a price series from disk.
+
+    Supports .npy files holding a (T, 2) array, .npz files with "times" and
+    "prices" arrays, and CSV files with a header row. Times are seconds
+    (e.g. unix timestamps); prices are output tokens per input token.
+
+    Returns:
+        tuple: (times, prices) float arrays sorted by time.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            times, prices = data["times"], data["prices"]
+    elif path.endswith(".npy"):
+        data = np.load(path)
+        times, prices = data[:, 0], data[:, 1]
+    else:
+        data = np.genfromtxt(path, delimiter=",", names=True)
+        names = data.dtype.names
+        if type(time_column) == int:
+            time_column = names[time_column]
+        if type(price_column) == int:
+            price_column = names[price_column]
+        times, prices = data[time_column], data[price_column]
+    times = np.asarray(times, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    order = np.argsort(times, kind="stable")
+    return times[order], prices[order]
+
+
+class BacktestResult:
+    """Per-configuration outcome of a backtest.
+
+    Attributes:
+        filled: Whether the configuration filled at all.
+        fill_time: Seconds from the start of the series to the (last) fill,
+            NaN when unfilled.
+        fill_price: (Average) execution price, NaN when unfilled.
+        opportunity_cost: Fraction of value lost against trading everything
+            at the start price. Unfilled amounts are marked to the last price
+            of the series. Positive means worse than trading immediately.
+    """
+
+    def __init__(self, filled, fill_time, fill_price, opportunity_cost,
+                 configs=None):
+        self.filled = filled
+        self.fill_time = fill_time
+        self.fill_price = fill_price
+        self.opportunity_cost = opportunity_cost
+        self.configs = configs
+
+    def __len__(self):
+        return len(self.filled)
+
+    def __str__(self):
+        return f"<BacktestResult configs: {len(self)}, " \
+            f"filled: {int(self.filled.sum())}>"
+    __repr__ = __str__
+
+
+def _triggered(times, prices, levels, above, expirations):
+    # First index at which the price crosses each level. The running extreme
+    # of the series is monotonic, so every level is a binary search.
+    levels = np.asarray(levels, dtype=float)
+    above = np.broadcast_to(np.asarray(above, dtype=bool), levels.shape)
+    running_max = np.maximum.accumulate(prices)
+    running_min_neg = np.maximum.accumulate(-prices)
+    idx = np.where(above,
+                   np.searchsorted(running_max, levels, side="left"),
+                   np.searchsorted(running_min_neg, -levels, side="left"))
+    elapsed = np.full(levels.shape, np.inf)
+    hit = idx < len(prices)
+    elapsed[hit] = times[idx[hit]] - times[0]
+    filled = hit & (elapsed <= np.asarray(expirations, dtype=float))
+    return filled, np.minimum(idx, len(prices) - 1)
+
+
+def _cross_result(times, prices, filled, idx, configs=None):
+    start = prices[0]
+    fill_time = np.where(filled, times[idx] - times[0], np.nan)
+    fill_price = np.where(filled, prices[idx], np.nan)
+    cost = 1 - np.where(filled, fill_price, prices[-1]) / start
+    return BacktestResult(filled, fill_time, fill_price, cost, configs)
+
+
+def limit_grid(times, prices, limit_prices, expirations=np.inf):
+    """Backtest a grid of limit orders selling the input token.
+
+    An order fills at the first price at or above its limit price, if that
+    happens before its expiration (seconds from the start).
+    """
+    filled, idx = _triggered(times, prices, limit_prices, True, expirations)
+    return _cross_result(times, prices, filled, idx)
+
+
+def stop_loss_grid(times, prices, trigger_prices, is_above,
+                   expirations=np.inf):
+    """Backtest a grid of stop orders. An order fills at the first price at
+    or above (is_above) or at or below its trigger price, if that happens
+    before its expiration (seconds from the start).
+    """
+    filled, idx = _triggered(times, prices, trigger_prices, is_above,
+                             expirations)
+    return _cross_result(times, prices, filled, idx)
+
+
+def twap_grid(times, prices, time_windows, rounds, lower_bounds=None,
+              upper_bounds=None, expirations=np.inf):
+    """Backtest a grid of TWAP schedules with evenly spaced rounds.
+
+    Rounds whose price falls outside the [lower_bounds, upper_bounds] price
+    range, or that start after the expiration, are skipped. fill_price is the
+    average price of the executed rounds and fill_time the start of the last
+    executed round.
+    """
+    time_windows = np.asarray(time_windows, dtype=float)
+    rounds = np.broadcast_to(np.asarray(rounds, dtype=int),
+                             time_windows.shape)
+    n = len(time_windows)
+    max_rounds = int(rounds.max())
+
+    k = np.arange(max_rounds)[None, :]
+    active = k < rounds[:, None]
+    offsets = k * (time_windows / rounds)[:, None]
+    at = times[0] + offsets
+    round_prices = np.interp(at, times, prices)
+
+    ok = active & (offsets <= np.broadcast_to(
+        np.asarray(expirations, dtype=float), (n,))[:, None])
+    ok &= at <= times[-1]
+    if lower_bounds is not None:
+        ok &= round_prices >= np.broadcast_to(
+            np.asarray(lower_bounds, dtype=float), (n,))[:, None]
+    if upper_bounds is not None:
+        ok &= round_prices <= np.broadcast_to(
+            np.asarray(upper_bounds, dtype=float), (n,))[:, None]
+
+    executed = ok.sum(axis=1)
+    filled = executed > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fill_price = np.where(ok, round_prices, 0).sum(axis=1) / executed
+    fill_price = np.where(filled, fill_price, np.nan)
+    last = np.where(ok, offsets, -1).max(axis=1)
+    fill_time = np.where(filled, last, np.nan)
+
+    start = prices[0]
+    done = executed / rounds
+    realized = np.where(filled, fill_price, 0) * done + \
+        prices[-1] * (1 - done)
+    cost = 1 - realized / start
+    return BacktestResult(filled, fill_time, fill_price, cost)
+
+
+def backtest(algos, times, prices, default_rounds=None):
+    """Backtest algos built with AlgoWrapper against one price series.
+
+    Algos are grouped by type and each group is evaluated as one vectorized
+    grid.
+
+    Args:
+        algos (list): Limit, StopLoss and TWAP algos.
+        times: Sample times in seconds, shape (T,).
+        prices: Output tokens per input token, shape (T,).
+        default_rounds (int): Rounds for TWAP algos without max_rounds.
+
+    Returns:
+        BacktestResult: One entry per algo, in the given order.
+    """
+    times = np.asarray(times, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    n = len(algos)
+    filled = np.zeros(n, dtype=bool)
+    fill_time = np.full(n, np.nan)
+    fill_price = np.full(n, np.nan)
+    cost = np.full(n, np.nan)
+
+    def expiration_of(algo):
+        p = algo.find_policy(policy.Expiration)
+        return np.inf if p is None else p.seconds
+
+    groups = {Limit: [], StopLoss: [], TWAP: []}
+    for i, algo in enumerate(algos):
+        if type(algo) not in groups:
+            raise DexibleAlgoException(
+                f"Cannot backtest {algo.name} algos")
+        groups[type(algo)].append(i)
+
+    def store(idx, result):
+        filled[idx] = result.filled
+        fill_time[idx] = result.fill_time
+        fill_price[idx] = result.fill_price
+        cost[idx] = result.opportunity_cost
+
+    if groups[Limit]:
+        idx = groups[Limit]
+        store(idx, limit_grid(
+            times, prices,
+            [float(algos[i].find_policy(policy.LimitPrice).price.rate)
+             for i in idx],
+            [expiration_of(algos[i]) for i in idx]))
+
+    if groups[StopLoss]:
+        idx = groups[StopLoss]
+        stops = [algos[i].find_policy(policy.StopPrice) for i in idx]
+        store(idx, stop_loss_grid(
+            times, prices,
+            [float(s.trigger.rate) for s in stops],
+            [s.above for s in stops],
+            [expiration_of(algos[i]) for i in idx]))
+
+    if groups[TWAP]:
+        idx = groups[TWAP]
+        windows, rounds, lower, upper, expirations = [], [], [], [], []
+        for i in idx:
+            algo = algos[i]
+            delay = algo.find_policy(policy.BoundedDelay)
+            windows.append(delay.time_window_seconds)
+            r = algo.max_rounds or default_rounds
+            if not r:
+                raise DexibleAlgoException(
+                    "default_rounds is required for TWAP algos without "
+                    "max_rounds")
+            rounds.append(r)
+            bounds = algo.find_policy(policy.PriceBounds)
+            lo, hi = -np.inf, np.inf
+            if bounds is not None:
+                base = float(bounds.base_price.rate)
+                if bounds.lower_bound_percent is not None:
+                    lo = base * (1 - bounds.lower_bound_percent / 100)
+                if bounds.upper_bound_percent is not None:
+                    hi = base * (1 + bounds.upper_bound_percent / 100)
+            lower.append(lo)
+            upper.append(hi)
+            expiration = expiration_of(algo)
+            if delay.expire_after_time_window:
+                expiration = min(expiration, delay.time_window_seconds)
+            expirations.append(expiration)
+        store(idx, twap_grid(times, prices, windows, rounds, lower, upper,
+                             expirations))
+
+    return BacktestResult(filled, fill_time, fill_price, cost, configs=algos)
@@ -0,0 +1,85 @@
+import logging
+from .common import token_address
+
+log = logging.getLogger('BudgetLedger')
+
+# Orders in these states can still pull input tokens from the wallet
+COMMITTED_STATES = ["active", "pending", "paused"]
+
+
+def _key(owner, token):
+    # accepts Token instances as well as raw order record fields
+    return (str(owner).lower(), token_address(token))
+
+
+class BudgetLedger:
+    """Reservation ledger of input token amounts per (owner, token).
+
+    The budget for a token is the smaller of the balance and allowance
+    snapshots on the Token instance (as returned by TokenSupport.lookup), minus
+    everything already reserved by pending and active orders. No RPC calls are
+    made; refresh the Token snapshot to pick up on-chain changes.
+    """
+
+    def __init__(self):
+        self.reserved = {}
+
+    def load_orders(self, owner, records):
+        """Reserve the input amounts of existing orders in a single pass.
+
+        Args:
+            owner (str): Wallet address the orders belong to.
+            records (iterable): Order records, e.g. from OrderWrapper.get_all
+                or OrderStore.find. Orders not in a committed state are
+                ignored.
+        """
+        for record in records:
+            if record.get("state") not in COMMITTED_STATES:
+                continue
+            self.reserve(owner, record.get("tokenIn"),
+                         int(record.get("amountIn") or 0))
+
+    def reserve(self, owner, token, amount):
+        key = _key(owner, token)
+        self.reserved[key] = self.reserved.get(key, 0) + amount
+
+    def release(self, owner, token, amount):
+        key = _key(owner, token)
+        left = self.reserved.get(key, 0) - amount
+        if left > 0:
+            self.reserved[key] = left
+        else:
+            self.reserved.pop(key, None)
+
+    def reserved_for(self, owner, token):
+        return self.reserved.get(_key(owner, token), 0)
+
+    def remaining(self, owner, token):
+        """Amount of token still available to new orders from owner."""
+        budget = min(token.balance or 0, token.allowance or 0)
+        return max(budget - self.reserved_for(owner, token), 0)
+
+    def allocate(self, owner, token, amount, resize=False):
+        """Reserve amount of token for a new order.
+
+        Args:
+            owner (str): Wallet address placing the order.
+            token (Token): Input token, with balance and allowance loaded.
+            amount (int): Requested input amount in token units.
+            resize (bool): Shrink the request to the remaining budget rather
+                than rejecting it.
+
+        Returns:
+            int: The reserved amount, or 0 if the request was rejected.
+        """
+        available = self.remaining(owner, token)
+        if amount > available:
+            if not resize or available == 0:
+                log.debug(f"Rejecting {amount} of {token.address}; "
+                          f"only {available} left")
+                return 0
+            log.debug(f"Resizing {amount} of {token.address} "
+                      f"down to {available}")
+            amount = available
+        self.reserve(owner, token, amount)
+        return amount
@@ -1,4 +1,10 @@
-from decimal import Decimal
+import csv
+import io
+import itertools
+import json
+from collections import deque
+from decimal import Context, Decimal, ROUND_HALF_EVEN
+from fractions import Fraction
 from .exceptions import DexibleException
 
 
@@ -35,12 +41,67 @@ CHAIN_CONFIG = {
 }
 
 
-class Token:
-    address: str
-    decimals: int
-    symbol: str
-    balance: int
-    allowance: int
+# Source of revision stamps. Every stamp is larger than any handed out
+# before it; next() on a count is atomic, so threads need no lock.
+_stamps = itertools.count(1)
+
+
+class Memoizable:
+    """Caches derived forms (serialized dicts, JSON fragments) of an object
+    until it or one of the objects it contains is modified.
+
+    Every object keeps its own revision, restamped by attribute assignment.
+    An object's state is the newest revision among itself and its children
+    (see _children, e.g. the policies of an algo and the prices of a
+    policy), so modifying one object only invalidates the objects that
+    contain it. In-place changes (e.g. appending to a list attribute) are
+    not seen; call invalidate() after making them.
+    """
+    __slots__ = ("_memo", "_revision")
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_revision", next(_stamps))
+
+    def invalidate(self):
+        object.__setattr__(self, "_revision", next(_stamps))
+
+    def _children(self):
+        """Memoizable objects whose state is part of this one."""
+        return ()
+
+    def _state(self):
+        # stamps only grow, so any change below raises the maximum, and a
+        # replaced child restamps this object
+        state = getattr(self, "_revision", 0)
+        for child in self._children():
+            if isinstance(child, Memoizable):
+                revision = child._state()
+                if revision > state:
+                    state = revision
+        return state
+
+    def _memoized(self, key, build):
+        state = self._state()
+        memo = getattr(self, "_memo", None)
+        if memo is None:
+            memo = {}
+            object.__setattr__(self, "_memo", memo)
+        else:
+            hit = memo.get(key)
+            if hit is not None and hit[0] == state:
+                return hit[1]
+        value = build()
+        memo[key] = (state, value)
+        return value
+
+
+def json_fragment(value):
+    return json.dumps(value).encode()
+
+
+class Token(Memoizable):
+    __slots__ = ("address", "decimals", "symbol", "balance", "allowance")
 
     def __init__(self, address, decimals, symbol, balance, allowance):
         self.address = address
@@ -57,23 +118,121 @@ class Token:
     __repr__ = __str__
 
 
+def token_address(token):
+    """Lowercase address of a Token, an order record token field (address
+    string or dict) or a plain address; None when there is none.
+    """
+    token = getattr(token, "address", token)
+    if type(token) == dict:
+        token = token.get("address")
+    if token is None:
+        return None
+    return str(token).lower()
+
+
 class Contact:
     api_client = None
+    # endpoint of the contact methods; the request helpers below are shared
+    # with the blocking SDK
+    _path = "contact-method"
 
     def __init__(self, api_client):
         self.api_client = api_client
 
     async def add(self, email):
-        return await self.api_client.post("contact-method/create", data={
-            "identifier": email,
-            "contact_method": "email"})
+        return await self.api_client.post(*self._add_request(email))
 
     async def get_all(self):
-        return await self.api_client.get("contact-method")
+        return await self.api_client.get(self._path)
 
     async def toggle(self, id):
-        return await self.api_client.post(
-            f"contact-method/toggle/{id}", data={"id": id})
+        return await self.api_client.post(*self._toggle_request(id))
+
+    @classmethod
+    def _add_request(cls, email):
+        return f"{cls._path}/create", {"identifier": email,
+                                       "contact_method": "email"}
+
+    @classmethod
+    def _toggle_request(cls, id):
+        return f"{cls._path}/toggle/{id}", {"id": id}
+
+
+def _report_lines(payload):
+    # The report endpoint wraps the CSV text in JSON; depending on the route
+    # it arrives as one string, a list of lines or a list of rows
+    if type(payload) == bytes:
+        payload = payload.decode()
+    if type(payload) == str:
+        stripped = payload.lstrip()
+        if stripped.startswith("[") or stripped.startswith('"'):
+            try:
+                return _report_lines(json.loads(payload))
+            except ValueError:
+                pass
+        return io.StringIO(payload)
+    if type(payload) == list:
+        return payload
+    raise DexibleException("Unsupported report payload",
+                           json_response=payload)
+
+
+def _report_rows(payload):
+    """Iterate over the rows of a report payload, header first."""
+    lines = _report_lines(payload)
+    if type(lines) == list and len(lines) > 0 and type(lines[0]) == list:
+        return iter(lines)
+    return csv.reader(lines)
+
+
+def _windows(start, end, chunk):
+    lo = start
+    while lo < end:
+        hi = min(lo + chunk, end)
+        yield lo, hi
+        lo = hi
+
+
+def _window_rows(payload, previous_ids, ids, order_id_column):
+    # Row dicts of one report window. Every order id of the window is added
+    # to ids, also the ones dropped, since the next window can repeat them
+    # too; rows whose id was in the previous window are dropped.
+    rows = _report_rows(payload)
+    header = next(rows, None)
+    if header is None:
+        return
+    for values in rows:
+        if len(values) == 0:
+            continue
+        row = dict(zip(header, values))
+        order_id = row.get(order_id_column)
+        if order_id is not None:
+            duplicate = order_id in previous_ids or order_id in ids
+            ids.add(order_id)
+            if duplicate:
+                continue
+        yield row
+
+
+class _WindowRows:
+    # Row dicts of consecutive report windows; rows whose order id was in the
+    # previous window are dropped, see _window_rows
+
+    def __init__(self, order_id_column):
+        self.order_id_column = order_id_column
+        self.previous_ids = set()
+
+    def rows(self, payload):
+        ids = set()
+        yield from _window_rows(payload, self.previous_ids, ids,
+                                self.order_id_column)
+        self.previous_ids = ids
+
+
+def _dict_rows_payload(rows):
+    # back to a header + rows payload so parse_summary can read it
+    header = list(rows[0].keys()) if len(rows) > 0 else []
+    return [header] + [[row.get(h, "") for h in header] for row in rows]
 
 
 class Reports:
@@ -82,32 +241,118 @@ class Reports:
     def __init__(self, api_client):
         self.api_client = api_client
 
-    async def get_summary_delta(self, start, delta):
+    async def get_summary_delta(self, start, delta, columnar=False,
+                                **kwargs):
         """Retrieve the report summary based on a start date and time delta.  The time delta is added to the start date to compute the report window.
 
         Args:
             start (datetime.datetime): Start datetime object.
             delta (datetime.timedelta): Timedelta parameter that is added to the start date to get the report window.  Delta should be negative to get data from the past.
+            columnar (bool): Return a parsed ReportTable instead of the raw payload. See get_summary_between.
 
         Returns:
             string: CVS formatted output for the report as a JSON array.
         """
-        return await self.get_summary_between(start, (start + delta))
+        return await self.get_summary_between(start, (start + delta),
+                                              columnar=columnar, **kwargs)
 
-    async def get_summary_between(self, start, end):
+    async def get_summary_between(self, start, end, columnar=False,
+                                  amounts=None, token_decimals=None,
+                                  chunk=None, concurrency=4):
         """Retrieve the report summary based on a start and end datetime objects.
 
         Args:
             start (datetime.datetime): Start datetime object.
             end (datetime.datetime): End datetime object.
+            columnar (bool): Return a dexible.report_table.ReportTable of typed numpy columns instead of the raw payload. Requires numpy.
+            amounts (dict): With columnar, amount columns to convert to token amounts. See dexible.report_table.parse_summary.
+            token_decimals (dict): With columnar, token address or symbol to decimals used for the amount columns.
+            chunk (datetime.timedelta): Fetch the window as concurrent sub-windows of this length. See iter_summary.
+            concurrency (int): With chunk, the maximum number of sub-window requests in flight.
 
         Returns:
-            string: CVS formatted output for the report as a JSON array.
+            string: CVS formatted output for the report as a JSON array, or a ReportTable when columnar is set. With chunk and without columnar, a list of row dicts.
         """
-        return await self.api_client.post("report/order_summary/csv", data={
-            "startDate": start.timestamp(),
-            "endDate": end.timestamp()})
+        if chunk is None:
+            payload = await self.api_client.post(
+                *self._summary_request(start, end))
+        else:
+            payload = [row async for row in self.iter_summary(
+                start, end, chunk=chunk, concurrency=concurrency)]
+        return self._summary(payload, chunk is not None, columnar, amounts,
+                             token_decimals)
+
+    @staticmethod
+    def _summary_request(start, end):
+        # endpoint and body of one summary request, shared with the
+        # blocking SDK
+        return "report/order_summary/csv", {"startDate": start.timestamp(),
+                                            "endDate": end.timestamp()}
+
+    @staticmethod
+    def _summary(payload, as_rows, columnar, amounts, token_decimals):
+        # Result of get_summary_between from the raw payload, or from the
+        # row dicts of iter_summary when as_rows is set
+        if not columnar:
+            return payload
+        if as_rows:
+            payload = _dict_rows_payload(payload)
+        from .report_table import parse_summary
+        return parse_summary(payload,
+                             amounts=amounts,
+                             token_decimals=token_decimals)
+
+    @staticmethod
+    def _summary_windows(start, end, chunk):
+        if end < start:
+            start, end = end, start
+        assert(chunk.total_seconds() > 0)
+        return _windows(start, end, chunk)
 
+    async def iter_summary(self, start, end, chunk, concurrency=4,
+                           order_id_column="orderId"):
+        """Stream the report summary of a long window as row dicts.
+
+        The window is split into sub-windows of length chunk which are
+        fetched concurrently, at most concurrency at a time. Rows are yielded
+        in time order as soon as every earlier sub-window has arrived; rows
+        repeated at a sub-window boundary are dropped by order id.
+
+        Args:
+            start (datetime.datetime): Start datetime object.
+            end (datetime.datetime): End datetime object. May be before start.
+            chunk (datetime.timedelta): Length of each sub-window.
+            concurrency (int): Maximum number of requests in flight.
+            order_id_column (str): Column used to drop duplicate rows.
+
+        Yields:
+            dict: Report rows keyed by the CSV header.
+        """
+        # imported here so that importing Price does not pull in asyncio
+        import asyncio
+        assert(concurrency > 0)
+
+        pending = deque()
+        todo = self._summary_windows(start, end, chunk)
+
+        def launch():
+            for lo, hi in todo:
+                pending.append(asyncio.ensure_future(
+                    self.get_summary_between(lo, hi)))
+                if len(pending) >= concurrency:
+                    return
+
+        launch()
+        windows = _WindowRows(order_id_column)
+        try:
+            while len(pending) > 0:
+                payload = await pending.popleft()
+                launch()
+                for row in windows.rows(payload):
+                    yield row
+        finally:
+            for task in pending:
+                task.cancel()
 
 
 def as_units(numberish, unit="ether"):
@@ -132,29 +377,219 @@ def as_decs(numberish, unit="ether"):
     return Decimal(numberish) / 10**unit
 
 
-class Price:
+# Enough precision for any 256-bit amount at any token decimals, so the
+# array conversions never round
+_EXACT = Context(prec=200)
+_POW10 = {}
+
+
+def _pow10(unit):
+    p = _POW10.get(unit)
+    if p is None:
+        p = _POW10[unit] = 10 ** unit
+    return p
+
+
+def _is_ndarray(values):
+    return type(values).__module__ == "numpy" and hasattr(values, "dtype")
+
+
+def _units_for(unit, count):
+    if isinstance(unit, str):
+        if unit != "ether":
+            raise DexibleException(f"Unsupported unit: {unit}")
+        unit = 18
+    if not hasattr(unit, "__len__"):
+        return [int(unit)] * count
+    units = [int(u) for u in unit]
+    if len(units) != count:
+        raise DexibleException("unit and values differ in length")
+    return units
+
+
+def as_units_array(values, unit="ether"):
+    """
+    Array version of as_units.
+
+    Takes a sequence or numpy array of numberish values and a unit (decimals)
+    shared by all values or given per value. Returns exact integer (wei)
+    amounts: a list, or a numpy object array for numpy input. Unlike the
+    scalar version, values with more than 28 significant digits are not
+    rounded.
+    """
+    count = len(values)
+    units = _units_for(unit, count)
+    if _is_ndarray(values) and values.dtype.kind in "iu" and \
+            not hasattr(unit, "__len__"):
+        # exact Python ints, multiplied in C
+        return values.astype(object) * _pow10(units[0] if count else 18)
+
+    out = []
+    for v, u in zip(values, units):
+        if type(v) is int:
+            out.append(v * _pow10(u))
+        elif type(v) is Decimal:
+            out.append(int(v.scaleb(u, _EXACT)))
+        elif hasattr(v, "__index__"):
+            out.append(v.__index__() * _pow10(u))
+        else:
+            out.append(int(Decimal(v).scaleb(u, _EXACT)))
+    if _is_ndarray(values):
+        import numpy
+        return numpy.array(out, dtype=object)
+    return out
+
+
+def as_decs_array(values, unit="ether", as_float=False):
+    """
+    Array version of as_decs.
+
+    Takes a sequence or numpy array of integer (wei) amounts and a unit
+    (decimals) shared by all values or given per value. Returns exact
+    Decimal values (a list, or a numpy object array for numpy input), or
+    correctly rounded floats (a list, or a float64 numpy array) when as_float
+    is set.
+    """
+    count = len(values)
+    units = _units_for(unit, count)
+    if as_float:
+        if _is_ndarray(values) and values.dtype.kind in "iu" and \
+                not hasattr(unit, "__len__"):
+            return values / float(_pow10(units[0] if count else 18))
+        out = [int(v) / _pow10(u) for v, u in zip(values, units)]
+        if _is_ndarray(values):
+            import numpy
+            return numpy.array(out, dtype=float)
+        return out
+
+    out = [Decimal(int(v)).scaleb(-u, _EXACT) for v, u in zip(values, units)]
+    if _is_ndarray(values):
+        import numpy
+        return numpy.array(out, dtype=object)
+    return out
+
+
+def _to_units(value, decimals):
+    # floats go through their shortest repr so that 0.1 is 0.1, not the
+    # binary expansion
+    if type(value) == float:
+        value = repr(value)
+    return int(Decimal(value).scaleb(decimals).to_integral_value(
+        ROUND_HALF_EVEN))
+
+
+def _as_list(values):
+    # numpy arrays and scalars become plain Python numbers
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return values
+
+
+class Price(Memoizable):
+    """Exchange rate between two tokens, held exactly as the integer ratio
+    out_amount / in_amount of base units. The Decimal rate is computed on
+    first use and kept until an amount or token is reassigned; the inverse
+    price is cached.
+    """
+    __slots__ = ("in_token", "out_token", "in_amount", "out_amount", "_rate")
+
     @staticmethod
     def units_to_price(in_token, out_token, in_units, out_units):
         return Price(in_token,
                      out_token,
-                     as_units(round(in_units, in_token.decimals)),
-                     as_units(round(out_units, out_token.decimals)))
+                     _to_units(in_units, in_token.decimals),
+                     _to_units(out_units, out_token.decimals))
 
-    def __init__(self, in_token, out_token, in_amount, out_amount):
-        self.in_token = in_token
-        self.out_token = out_token
-        self.in_amount = in_amount
-        self.out_amount = out_amount
+    @staticmethod
+    def _broadcast(in_values, out_values):
+        in_values = _as_list(in_values)
+        out_values = _as_list(out_values)
+        # strings are single decimal amounts, not sequences
+        if type(in_values) == str or not hasattr(in_values, "__len__"):
+            in_values = [in_values] * len(out_values)
+        if type(out_values) == str or not hasattr(out_values, "__len__"):
+            out_values = [out_values] * len(in_values)
+        if len(in_values) != len(out_values):
+            raise DexibleException("in_amounts and out_amounts differ "
+                                   "in length")
+        return in_values, out_values
+
+    @staticmethod
+    def batch(in_token, out_token, in_amounts, out_amounts):
+        """Build many prices for one token pair in a single call.
 
-        in_units = +as_decs(self.in_amount, self.in_token.decimals)
-        out_units = +as_decs(self.out_amount, self.out_token.decimals)
-        self.rate = out_units / in_units
+        Args:
+            in_token (Token): Input token shared by all prices.
+            out_token (Token): Output token shared by all prices.
+            in_amounts: Input amounts in base units; a sequence, a numpy
+                array or a single int used for every price.
+            out_amounts: Output amounts in base units; a sequence, a numpy
+                array or a single int used for every price.
+
+        Returns:
+            list: Price objects.
+        """
+        in_amounts, out_amounts = Price._broadcast(in_amounts, out_amounts)
+        new = Price.__new__
+        init = object.__setattr__
+        prices = []
+        for in_amount, out_amount in zip(in_amounts, out_amounts):
+            p = new(Price)
+            init(p, "in_token", in_token)
+            init(p, "out_token", out_token)
+            init(p, "in_amount", int(in_amount))
+            init(p, "out_amount", int(out_amount))
+            init(p, "_rate", None)
+            prices.append(p)
+        return prices
+
+    @staticmethod
+    def batch_units(in_token, out_token, in_units, out_units):
+        """Like batch(), but from decimal token amounts as taken by
+        units_to_price().
+        """
+        in_units, out_units = Price._broadcast(in_units, out_units)
+        return Price.batch(
+            in_token, out_token,
+            [_to_units(u, in_token.decimals) for u in in_units],
+            [_to_units(u, out_token.decimals) for u in out_units])
+
+    def __init__(self, in_token, out_token, in_amount, out_amount):
+        # a new price is in no cache yet; skip the per-field bookkeeping
+        init = object.__setattr__
+        init(self, "in_token", in_token)
+        init(self, "out_token", out_token)
+        init(self, "in_amount", in_amount)
+        init(self, "out_amount", out_amount)
+        init(self, "_rate", None)
+
+    def __setattr__(self, name, value):
+        Memoizable.__setattr__(self, name, value)
+        object.__setattr__(self, "_rate", None)
+
+    def _children(self):
+        return (self.in_token, self.out_token)
+
+    @property
+    def rate(self):
+        rate = self._rate
+        if rate is None:
+            in_units = +as_decs(self.in_amount, self.in_token.decimals)
+            out_units = +as_decs(self.out_amount, self.out_token.decimals)
+            rate = out_units / in_units
+            object.__setattr__(self, "_rate", rate)
+        return rate
+
+    def as_fraction(self):
+        """The exact rate, in whole output tokens per whole input token."""
+        return Fraction(self.out_amount * 10 ** self.in_token.decimals,
+                        self.in_amount * 10 ** self.out_token.decimals)
 
     def inverse(self):
-        return Price(self.out_token,
-                     self.in_token,
-                     self.out_amount,
-                     self.in_amount)
+        return self._memoized("inverse", lambda: Price(self.out_token,
+                                                       self.in_token,
+                                                       self.out_amount,
+                                                       self.in_amount))
 
     def to_fixed(self, digits):
         return round(self.rate, digits)
@@ -163,6 +598,26 @@ class Price:
         return round(self.rate,
                      min(self.in_token.decimals, self.out_token.decimals))
 
+    @staticmethod
+    def from_json(data):
+        """Rebuild a Price from its toJSON() form. The tokens carry no
+        balance or allowance.
+        """
+        in_token = data["inToken"]
+        out_token = data["outToken"]
+        return Price(Token(address=in_token["address"],
+                           decimals=in_token["decimals"],
+                           symbol=in_token.get("symbol"),
+                           balance=None,
+                           allowance=None),
+                     Token(address=out_token["address"],
+                           decimals=out_token["decimals"],
+                           symbol=out_token.get("symbol"),
+                           balance=None,
+                           allowance=None),
+                     int(data["inAmount"]),
+                     int(data["outAmount"]))
+
     def toJSON(self):
         return {
             "inToken": {"address": self.in_token.address,
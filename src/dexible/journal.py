@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import time
+from .tag_index import CLIENT_ORDER_ID, _order_id
+
+log = logging.getLogger('OrderJournal')
+
+INTENT = "intent"
+RESULT = "result"
+FAILED = "failed"
+MISSING = "missing"
+
+
+def client_order_id(tags):
+    for tag in tags or []:
+        if tag.get("name") == CLIENT_ORDER_ID:
+            return tag.get("value")
+    return None
+
+
+class OrderJournal:
+    """Append-only write-ahead journal of order submissions.
+
+    An intent entry, keyed by the order's client_order_id tag, is flushed to
+    disk before the order is posted and a result entry is written once the
+    response arrives. After a crash, intents without a result are the only
+    submissions whose outcome is unknown; reconcile() resolves them against
+    the tag index or the most recent orders instead of the full history.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        torn = False
+        if os.path.exists(path):
+            self._replay()
+            torn = self._torn_tail()
+        self.file = open(path, "a")
+        if torn:
+            # end the partial line so the next entry starts on its own
+            self.file.write("\n")
+            self.file.flush()
+
+    def _torn_tail(self):
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _replay(self):
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a torn write from a crash; the intent before it is
+                    # still pending and gets reconciled
+                    log.warning(f"Skipping unreadable journal line: {line}")
+                    continue
+                self.entries[entry["clientOrderId"]] = entry
+
+    def close(self):
+        self.file.close()
+
+    def _append(self, entry):
+        entry["ts"] = time.time()
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.entries[entry["clientOrderId"]] = entry
+
+    def status(self, client_order_id):
+        entry = self.entries.get(client_order_id)
+        return entry["event"] if entry is not None else None
+
+    def result(self, client_order_id):
+        entry = self.entries.get(client_order_id)
+        if entry is None or entry["event"] != RESULT:
+            return None
+        return entry["response"]
+
+    def abandon(self, client_order_id):
+        """Mark a pending submission as never having reached the server, so
+        the order can be submitted again.
+
+        Only call this once the order is known not to exist, e.g. when its
+        quote has expired and no order with its client_order_id shows up.
+        """
+        self._append({"event": MISSING, "clientOrderId": client_order_id})
+
+    def pending(self):
+        """Client order ids whose submission outcome is unknown."""
+        return [coid for coid, entry in self.entries.items()
+                if entry["event"] == INTENT]
+
+    def record_intent(self, client_order_id, serialized):
+        self._append({"event": INTENT,
+                      "clientOrderId": client_order_id,
+                      "order": serialized})
+
+    def record_result(self, client_order_id, response):
+        self._append({"event": RESULT,
+                      "clientOrderId": client_order_id,
+                      "orderId": _order_id(response),
+                      "response": response})
+
+    def record_failure(self, client_order_id, error):
+        self._append({"event": FAILED,
+                      "clientOrderId": client_order_id,
+                      "error": str(error)})
+
+    async def reconcile(self, order_wrapper, lookback=200):
+        """Resolve intents left pending by a crash.
+
+        Each pending client order id is looked up in the wrapper's tag index
+        first. Any still unresolved are searched for among the most recent
+        orders only, since a lost submission is newer than everything the
+        journal has already settled.
+
+        Not finding an order is no proof that it was never created, so
+        unresolved intents stay pending and submit() keeps refusing them.
+        Use abandon() once an order is known not to exist.
+
+        Args:
+            order_wrapper (OrderWrapper): Wrapper used for lookups.
+            lookback (int): Number of most recent orders to search.
+
+        Returns:
+            dict: Client order id to the order record for every intent
+                resolved; pending() lists the rest.
+        """
+        run = _Reconciliation(self, order_wrapper, lookback)
+        for coid, order_id in run.indexed():
+            run.found(coid, await order_wrapper.get_one(order_id))
+        if run.searching():
+            records = run.recent()
+            try:
+                async for record in records:
+                    if run.scanned(record):
+                        break
+            finally:
+                await records.aclose()
+        return run.settle()
+
+    def reconcile_blocking(self, order_wrapper, lookback=200):
+        """Blocking form of reconcile(), for the SyncOrderWrapper of a
+        DexibleSyncSDK.
+        """
+        run = _Reconciliation(self, order_wrapper, lookback)
+        for coid, order_id in run.indexed():
+            run.found(coid, order_wrapper.get_one(order_id))
+        if run.searching():
+            records = run.recent()
+            try:
+                for record in records:
+                    if run.scanned(record):
+                        break
+            finally:
+                records.close()
+        return run.settle()
+
+
+class _Reconciliation:
+    # State of one reconcile() run; the lookups themselves are left to the
+    # async and blocking forms
+
+    def __init__(self, journal, order_wrapper, lookback):
+        self.journal = journal
+        self.order_wrapper = order_wrapper
+        self.lookback = lookback
+        self.resolved = {}
+        self.unresolved = set()
+        self.seen = 0
+
+    def indexed(self):
+        # Resolves pending intents from the tag index. Yields (client order
+        # id, order id) for those whose record has to be fetched, as the
+        # index keeps ids only
+        for coid in self.journal.pending():
+            record = self.order_wrapper.find_by_client_order_id(coid)
+            if record is not None:
+                self.resolved[coid] = record
+                continue
+            order_id = self.order_wrapper.find_id_by_tag(CLIENT_ORDER_ID,
+                                                         coid)
+            if order_id is not None:
+                yield coid, order_id
+            else:
+                self.unresolved.add(coid)
+
+    def found(self, coid, record):
+        if record is not None:
+            self.resolved[coid] = record
+        else:
+            self.unresolved.add(coid)
+
+    def searching(self):
+        return len(self.unresolved) > 0
+
+    def recent(self):
+        return self.order_wrapper.iter_all(
+            page_size=min(self.lookback, 100), state="all")
+
+    def scanned(self, record):
+        # Checks one of the most recent orders; True once the search is over
+        coid = client_order_id(record.get("tags"))
+        if coid in self.unresolved:
+            self.unresolved.discard(coid)
+            self.resolved[coid] = record
+        self.seen += 1
+        return len(self.unresolved) == 0 or self.seen >= self.lookback
+
+    def settle(self):
+        for coid, record in self.resolved.items():
+            self.journal.record_result(coid, record)
+        for coid in self.unresolved:
+            log.warning(f"Order {coid} not found in the last {self.lookback} "
+                        f"orders; leaving it pending")
+        return self.resolved
@@ -1,50 +1,142 @@
+import asyncio
+import contextlib
 import logging
-from .common import Token
-from .quote import get_quote
+from .common import Memoizable, Token, json_fragment
+from .quote import quote_body
 from .algo import DexibleBaseAlgorithm
-from .exceptions import (InvalidOrderException,
+import dexible.algo as algos
+from .budget import COMMITTED_STATES, BudgetLedger
+from .journal import RESULT, INTENT, client_order_id
+from .tag_index import TagIndex
+from .exceptions import (DexibleException,
+                         DexibleOrderException,
+                         InvalidOrderException,
                          OrderIncompleteException,
                          QuoteMissingException)
 
 log = logging.getLogger('DexOrder')
 
+# Bulk actions are dispatched in this order so that cancels are never stuck
+# behind pauses or resumes
+BULK_ACTIONS = ["cancel", "pause", "resume"]
 
-class DexOrder:
-    api_client = None
-    token_in = None
-    token_out = None
-    amount_in = None
-    algo = None
-    max_rounds = None
-    tags = []
-    fee = 0
-    quote = None
+
+def _orders_path(limit, offset, state):
+    assert(state in ["all", "active"])
+    return f"orders?limit={limit}&offset={offset}&state={state}"
+
+
+def _order_path(id):
+    return f"orders/{id}"
+
+
+def _action_request(action, id):
+    # endpoint and body of a cancel, pause or resume request
+    return f"{_order_path(id)}/actions/{action}", {"orderId": id}
+
+
+def _page_records(page):
+    # order listings come back either as a bare list or wrapped in an
+    # envelope object depending on the API version
+    if page is None:
+        return []
+    if type(page) == dict:
+        for key in ["data", "orders", "results"]:
+            if type(page.get(key)) == list:
+                return page[key]
+        return []
+    return page
+
+
+class OrderRecord(dict):
+    """An order record as returned by the orders endpoints.
+
+    Behaves as the raw dict; the algo and policies attributes decode the
+    record's algorithm and policies into dexible.algo / dexible.policy
+    objects on first access only, so records that are never inspected cost
+    nothing extra.
+    """
+    __slots__ = ("_algo",)
+
+    @property
+    def algo(self):
+        try:
+            return self._algo
+        except AttributeError:
+            pass
+        algorithm = self.get("algorithm")
+        policies = self.get("policies")
+        if type(algorithm) == dict:
+            # some endpoints nest the policies under the algorithm
+            policies = algorithm.get("policies", policies)
+            algorithm = algorithm.get("algorithm") or algorithm.get("name")
+        if algorithm is None:
+            self._algo = None
+        else:
+            self._algo = algos.from_json(algorithm, policies or [],
+                                         max_rounds=self.get("maxRounds"))
+        return self._algo
+
+    @property
+    def policies(self):
+        algo = self.algo
+        return algo.policies if algo is not None else []
+
+
+class DexOrder(Memoizable):
+    __slots__ = ("api_client", "token_in", "token_out", "amount_in", "algo",
+                 "max_rounds", "tags", "fee", "quote", "quote_id",
+                 "tag_index", "journal")
 
     def __init__(self, api_client, token_in, token_out, amount_in,
-                 algo, max_rounds, tags=[], quote_id=0):
+                 algo, max_rounds, tags=None, quote_id=0, tag_index=None,
+                 journal=None):
         self.api_client = api_client
         self.token_in = token_in
         self.token_out = token_out
         self.amount_in = amount_in
         self.algo = algo
         self.max_rounds = max_rounds
-        self.tags = tags
+        self.tags = tags if tags is not None else []
+        self.fee = 0
+        self.quote = None
         self.quote_id = quote_id
+        self.tag_index = tag_index
+        self.journal = journal
+
+    def _children(self):
+        return (self.algo, self.token_in, self.token_out)
 
     def serialize(self):
+        algo_serialized = self.algo.serialize()
+        serialized = self._serialize_head()
+        serialized["policies"] = algo_serialized["policies"]
+        serialized["algorithm"] = algo_serialized["algorithm"]
+        serialized["tags"] = serialized.pop("tags")
+        return serialized
+
+    def serialize_json(self):
+        """serialize() encoded as JSON bytes. Cached until the order, its algo
+        or policies change; in-place changes to tags need invalidate().
+        """
+        return self._memoized("serialize_json", self._serialize_json)
+
+    def _serialize_json(self):
+        head = json_fragment(self._serialize_head())
+        return head[:-1] + \
+            b', "policies": ' + self.algo.policies_json() + \
+            b', "algorithm": ' + json_fragment(self.algo.name) + b"}"
+
+    def _serialize_head(self):
         if self.quote_id == 0:
             raise OrderIncompleteException("No quote found to serialize order")
 
-        algo_serialized = self.algo.serialize()
-
         return {
             "tokenIn": self.token_in.address,
             "tokenOut": self.token_out.address,
             "quoteId": self.quote_id,
             "amountIn": str(self.amount_in),
             "networkId": self.api_client.chain_id,
-            "policies": algo_serialized["policies"],
-            "algorithm": algo_serialized["algorithm"],
             "tags": self.tags
         }
 
@@ -84,17 +176,23 @@ class DexOrder:
         return None
 
     async def prepare(self):
-        log.debug("Preparing order for submission")
-        slippage = self.algo.get_slippage()
-        if not slippage:
-            raise InvalidOrderException("Missing slippage amount",
-                                        json_response=slippage)
+        slippage = self._slippage()
         if not self.quote:
             if not self.quote_id:
                 await self._generate_quote(slippage)
             else:
                 await self._get_quote()
+        return self._prepared()
 
+    def _slippage(self):
+        log.debug("Preparing order for submission")
+        slippage = self.algo.get_slippage()
+        if not slippage:
+            raise InvalidOrderException("Missing slippage amount",
+                                        json_response=slippage)
+        return slippage
+
+    def _prepared(self):
         err = self.verify()
 
         if err is not None:
@@ -110,18 +208,24 @@ class DexOrder:
 
     async def _generate_quote(self, slippage_percent):
         log.debug("Generating a default quote...")
+        quotes = await self.api_client.post(
+            "quotes", data=self._quote_body(slippage_percent))
+        return self._pick_quote(quotes)
+
+    def _quote_body(self, slippage_percent):
         min_per_round = self.amount_in * 30 // 100
         if self.max_rounds:
             min_per_round = self.amount_in // self.max_rounds
 
-        quotes = await get_quote(self.api_client,
-                                 self.token_in,
-                                 self.token_out,
-                                 self.amount_in,
-                                 slippage_percent,
-                                 max_rounds=self.max_rounds,
-                                 min_order_size=min_per_round)
+        return quote_body(self.api_client.chain_id,
+                          self.token_in,
+                          self.token_out,
+                          self.amount_in,
+                          slippage_percent,
+                          max_rounds=self.max_rounds,
+                          min_order_size=min_per_round)
 
+    def _pick_quote(self, quotes):
         if quotes and type(quotes) == list and len(quotes) > 0:
             log.debug("Have quote result")
             # quotes array should have single-round and recommended quotes
@@ -150,15 +254,56 @@ class DexOrder:
         return quotes
 
     async def submit(self):
+        serialized, coid = self._submission()
+        if serialized is None:
+            return self.journal.result(coid)
+
+        log.debug("Sending raw order details: %s", serialized)
+        try:
+            result = await self.api_client.post("orders", serialized)
+        except DexibleException as e:
+            self._rejected(coid, e)
+            raise
+        return self._submitted(coid, result)
+
+    def _submission(self):
+        # Verifies the order and journals the intent. Returns the serialized
+        # order and its client order id; the order is None when the journal
+        # shows it was already submitted.
         log.debug("Verifying order...")
         err = self.verify()
         if err:
             log.error("Problem found during verification", err)
             raise InvalidOrderException(err, json_response=err)
 
-        serialized = self.serialize()
-        log.debug(f"Sending raw order details: {serialized}")
-        return await self.api_client.post("orders", serialized)
+        serialized = self.serialize_json().decode()
+
+        coid = None
+        if self.journal is not None:
+            coid = client_order_id(self.tags)
+            status = self.journal.status(coid)
+            if status == RESULT:
+                log.info(f"Order {coid} was already submitted")
+                return None, coid
+            elif status == INTENT:
+                raise DexibleOrderException(
+                    f"Outcome of an earlier submission of order {coid} is "
+                    "unknown; reconcile the journal first")
+            if coid is not None:
+                self.journal.record_intent(coid, serialized)
+        return serialized, coid
+
+    def _rejected(self, coid, error):
+        # the server answered, so the order definitely does not exist
+        if coid is not None:
+            self.journal.record_failure(coid, error.message)
+
+    def _submitted(self, coid, result):
+        if coid is not None:
+            self.journal.record_result(coid, result)
+        if self.tag_index is not None:
+            self.tag_index.add_submitted(self.tags, result)
+        return result
 
     def toJSON(self):
         return {
@@ -186,8 +331,20 @@ class DexOrder:
 class OrderWrapper:
     api_client = None
 
-    def __init__(self, api_client):
+    def __init__(self, api_client, journal=None, tag_records=0):
+        """
+        Args:
+            api_client: Client used for all order requests.
+            journal (OrderJournal): Optional write-ahead journal that makes
+                submission of orders tagged with a client_order_id
+                idempotent across restarts.
+            tag_records (int): Number of full order records the tag index
+                keeps for find_by_tag. 0 keeps only tag to id mappings,
+                None keeps every record. See TagIndex.
+        """
         self.api_client = api_client
+        self.tag_index = TagIndex(max_records=tag_records)
+        self.journal = journal
 
     async def prepare(self,
                       token_in: Token,
@@ -201,25 +358,259 @@ class OrderWrapper:
                          amount_in=amount_in,
                          algo=algo,
                          max_rounds=algo.max_rounds,
-                         tags=tags)
+                         tags=tags,
+                         tag_index=self.tag_index,
+                         journal=self.journal)
         return await order.prepare()
 
+    async def prepare_batch(self, specs, ledger=None, owner=None,
+                            resize=False):
+        """Prepare several orders, checking them against a shared budget.
+
+        Every order is first charged against the (owner, input token) budget
+        of the ledger, so that orders which together would overdraw the
+        wallet's balance or allowance are caught before any quote is
+        requested. The remaining orders are prepared concurrently.
+
+        Args:
+            specs (list): Dicts with the keyword arguments of prepare().
+            ledger (BudgetLedger): Budget to charge. When omitted, one is
+                loaded with the owner's orders in every committed state
+                (active, pending, paused), so the amounts they still hold
+                are accounted for. That pages through the whole order
+                history, as only active orders can be listed on their own;
+                for long histories pass a ledger loaded from an OrderStore.
+            owner (str): Wallet address. Defaults to the API client account.
+            resize (bool): Shrink orders to the remaining budget instead of
+                rejecting them.
+
+        Returns:
+            list: A prepared DexOrder, or the raised exception, per spec.
+        """
+        if owner is None:
+            owner = self.api_client.account.address
+        if ledger is None:
+            ledger = BudgetLedger()
+            ledger.load_orders(owner, [record async for record in
+                                       self.iter_all(state="all")
+                                       if record.get("state") in
+                                       COMMITTED_STATES])
+
+        async def prepare_one(spec):
+            with self._charged(ledger, owner, spec, resize) as kwargs:
+                return await self.prepare(**kwargs)
+
+        # allocate in submission order before any request goes out
+        tasks = [prepare_one(spec) for spec in specs]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    @contextlib.contextmanager
+    def _charged(self, ledger, owner, spec, resize):
+        # Charges the spec's order to the ledger and gives the prepare()
+        # arguments for the amount granted; the charge is released if
+        # preparing the order fails
+        amount_in = self._allocate(ledger, owner, spec, resize)
+        try:
+            yield dict(spec, amount_in=amount_in)
+        except Exception:
+            ledger.release(owner, spec["token_in"], amount_in)
+            raise
+
+    @staticmethod
+    def _allocate(ledger, owner, spec, resize):
+        token_in = spec["token_in"]
+        amount_in = ledger.allocate(owner, token_in, spec["amount_in"],
+                                    resize=resize)
+        if amount_in == 0:
+            raise InvalidOrderException(
+                "Order exceeds remaining balance or allowance of "
+                f"{token_in.symbol}",
+                json_response=spec["amount_in"])
+        return amount_in
+
     async def get_all(self, limit=100, offset=0, state="all"):
+        return await self.api_client.get(_orders_path(limit, offset, state))
+
+    async def iter_all(self, page_size=100, offset=0, state="all",
+                       prefetch=True):
+        """Iterate over every order, walking the paginated orders endpoint.
+
+        The next page is requested while the current one is being consumed,
+        so at most two pages are held in memory at any time. Iteration stops
+        on the first short page.
+
+        Args:
+            page_size (int): Number of orders requested per page.
+            offset (int): Offset of the first order to return.
+            state (str): Either "all" or "active".
+            prefetch (bool): Fetch the next page in the background.
+
+        Yields:
+            OrderRecord: Order records as returned by the API.
+        """
         assert(state in ["all", "active"])
-        return await self.api_client.get(
-            f"orders?limit={limit}&offset={offset}&state={state}")
+        assert(page_size > 0)
+        pending = asyncio.ensure_future(
+            self.get_all(limit=page_size, offset=offset, state=state))
+        try:
+            while pending is not None:
+                records, offset = self._page(await pending, page_size, offset)
+                pending = None
+                if offset is not None:
+                    pending = self.get_all(limit=page_size,
+                                           offset=offset,
+                                           state=state)
+                    if prefetch:
+                        pending = asyncio.ensure_future(pending)
+                for record in records:
+                    yield record
+        finally:
+            if asyncio.isfuture(pending):
+                pending.cancel()
+            elif pending is not None:
+                pending.close()
+
+    def _page(self, page, page_size, offset):
+        # The page's records, added to the tag index, and the offset of the
+        # next page, or None after the last (short) page
+        records = [OrderRecord(record) for record in _page_records(page)]
+        for record in records:
+            self.tag_index.add(record)
+        if len(records) < page_size:
+            return records, None
+        return records, offset + page_size
 
     async def get_one(self, id):
-        return await self.api_client.get(f"orders/{id}")
+        return self._order_record(await self.api_client.get(_order_path(id)))
+
+    @staticmethod
+    def _order_record(record):
+        if type(record) == dict:
+            record = OrderRecord(record)
+        return record
+
+    def find_by_tag(self, name, value):
+        """Look up an order by tag in the local tag index.
+
+        The index is filled from orders submitted through this wrapper and
+        from every page read with iter_all; no request is made. Records are
+        only kept when the wrapper was created with tag_records; find_id_by_tag
+        works either way.
+
+        Returns:
+            dict: The order record, or None if no indexed order has the tag
+                or its record is not kept.
+        """
+        return self.tag_index.get(name, value)
+
+    def find_id_by_tag(self, name, value):
+        """Id of the order tagged with name=value in the local tag index, or
+        None. No request is made.
+        """
+        return self.tag_index.lookup(name, value)
+
+    def find_by_client_order_id(self, client_order_id):
+        return self.tag_index.by_client_order_id(client_order_id)
 
     async def cancel(self, id):
-        return await self.api_client.post(f"orders/{id}/actions/cancel",
-                                          {"orderId": id})
+        return await self.api_client.post(*_action_request("cancel", id))
 
     async def pause(self, id):
-        return await self.api_client.post(f"orders/{id}/actions/pause",
-                                          {"orderId": id})
+        return await self.api_client.post(*_action_request("pause", id))
 
     async def resume(self, id):
-        return await self.api_client.post(f"orders/{id}/actions/resume",
-                                          {"orderId": id})
+        return await self.api_client.post(*_action_request("resume", id))
+
+    async def cancel_many(self, ids=None, where=None, concurrency=16):
+        """Cancel several orders with bounded concurrency.
+
+        Args:
+            ids (list): Order ids to cancel.
+            where (callable): Alternatively, a predicate applied to every
+                active order record; matching orders are cancelled.
+            concurrency (int): Maximum number of requests in flight.
+
+        Returns:
+            dict: Order id to API response, or to the raised exception.
+        """
+        ids = await self._resolve_ids(ids, where)
+        return (await self.bulk({"cancel": ids},
+                                concurrency=concurrency))["cancel"]
+
+    async def pause_many(self, ids=None, where=None, concurrency=16):
+        """Pause several orders. See cancel_many."""
+        ids = await self._resolve_ids(ids, where)
+        return (await self.bulk({"pause": ids},
+                                concurrency=concurrency))["pause"]
+
+    async def resume_many(self, ids=None, where=None, concurrency=16):
+        """Resume several orders. See cancel_many."""
+        ids = await self._resolve_ids(ids, where)
+        return (await self.bulk({"resume": ids},
+                                concurrency=concurrency))["resume"]
+
+    async def bulk(self, actions, concurrency=16):
+        """Run cancel/pause/resume actions over many orders at once.
+
+        All cancels are dispatched before any pause, and pauses before
+        resumes. A failing action does not stop the others.
+
+        Args:
+            actions (dict): Action name ("cancel", "pause" or "resume") to a
+                list of order ids.
+            concurrency (int): Maximum number of requests in flight.
+
+        Returns:
+            dict: Action name to a dict of order id to API response, or to
+                the raised exception.
+        """
+        assert(concurrency > 0)
+        outcomes, jobs = self._bulk_jobs(actions)
+        # the workers share one iterator, so every job is taken once and in
+        # dispatch order
+        todo = iter(jobs)
+
+        async def worker():
+            for action, id in todo:
+                try:
+                    outcomes[action][id] = await getattr(self, action)(id)
+                except Exception as e:
+                    outcomes[action][id] = self._bulk_failed(action, id, e)
+
+        await asyncio.gather(
+            *[worker() for _ in range(min(concurrency, len(jobs)))])
+        return outcomes
+
+    @staticmethod
+    def _bulk_jobs(actions):
+        # One (empty) outcome dict per action and the (action, id) jobs, both
+        # in dispatch order
+        for action in actions:
+            if action not in BULK_ACTIONS:
+                raise DexibleOrderException(
+                    f"Unsupported bulk order action: {action}")
+        outcomes = {action: {} for action in BULK_ACTIONS if action in actions}
+        return outcomes, [(action, id) for action in outcomes
+                          for id in actions[action]]
+
+    @staticmethod
+    def _bulk_failed(action, id, error):
+        log.error(f"Bulk {action} failed for order {id}: {error}")
+        return error
+
+    async def _resolve_ids(self, ids, where):
+        ids = self._given_ids(ids, where)
+        if ids is None:
+            ids = [record["id"]
+                   async for record in self.iter_all(state="active")
+                   if where(record)]
+        return ids
+
+    @staticmethod
+    def _given_ids(ids, where):
+        # The ids to act on, or None when they are to be picked with where
+        if (ids is None) == (where is None):
+            raise DexibleOrderException("Must provide either ids or where")
+        if ids is not None:
+            return list(ids)
+        return None
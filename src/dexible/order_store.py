@@ -0,0 +1,199 @@
+import json
+import logging
+import sqlite3
+from .budget import COMMITTED_STATES
+from .common import token_address
+from .exceptions import DexibleException
+from .tag_index import tag_key
+
+log = logging.getLogger('OrderStore')
+
+
+class OrderStore:
+    """Local copy of the account's orders that is kept in sync incrementally.
+
+    The first sync pages through every order. Later syncs re-read the active
+    set, fetch the stored orders in other live states (paused, pending) one
+    by one, and then walk the full listing only until the first record that
+    is already stored unchanged, so a refresh costs a couple of pages
+    instead of the whole history.
+
+    Orders are indexed by state, by (token in, token out) pair and by
+    (tag name, tag value) so dashboards can query locally.
+    """
+    ID_FIELD = "id"
+    STATE_FIELD = "state"
+    UPDATED_FIELD = "updatedAt"
+
+    def __init__(self, order_wrapper, path=None, page_size=100):
+        """
+        Args:
+            order_wrapper (OrderWrapper): Wrapper used to fetch orders.
+            path (str): Optional SQLite file used to persist the store.
+            page_size (int): Page size used when syncing.
+        """
+        self.order_wrapper = order_wrapper
+        self.page_size = page_size
+        self.orders = {}
+        self.by_state = {}
+        self.by_pair = {}
+        self.by_tag = {}
+        self.synced = False
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS orders "
+                            "(id TEXT PRIMARY KEY, record TEXT NOT NULL)")
+            self._load()
+
+    def _load(self):
+        for (record,) in self.db.execute("SELECT record FROM orders"):
+            self._index(json.loads(record))
+        self.synced = len(self.orders) > 0
+        log.debug(f"Loaded {len(self.orders)} orders from disk")
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def get(self, order_id):
+        return self.orders.get(str(order_id))
+
+    def find(self, state=None, token_in=None, token_out=None, tag=None):
+        """Query stored orders using the secondary indexes.
+
+        Args:
+            state (str): Only return orders in this state.
+            token_in (str): Only return orders selling this token address.
+            token_out (str): Only return orders buying this token address.
+                Must be combined with token_in.
+            tag (tuple): (name, value) pair the order must be tagged with.
+
+        Returns:
+            list: Matching order records.
+        """
+        candidates = None
+
+        def narrow(ids):
+            if candidates is None:
+                return set(ids)
+            return candidates & ids
+
+        if state is not None:
+            candidates = narrow(self.by_state.get(state, set()))
+        if token_in is not None or token_out is not None:
+            if token_in is None or token_out is None:
+                raise DexibleException("token_in and token_out must be "
+                                       "supplied together")
+            pair = (token_address(token_in), token_address(token_out))
+            candidates = narrow(self.by_pair.get(pair, set()))
+        if tag is not None:
+            candidates = narrow(self.by_tag.get(
+                tag_key(tag[0], tag[1]), set()))
+        if candidates is None:
+            return list(self.orders.values())
+        return [self.orders[i] for i in candidates]
+
+    async def sync(self):
+        """Bring the store up to date with the server.
+
+        Returns:
+            int: Number of inserted or changed orders.
+        """
+        changed = []
+        if not self.synced:
+            async for record in self.order_wrapper.iter_all(
+                    page_size=self.page_size, state="all"):
+                if self._upsert(record):
+                    changed.append(record)
+            self.synced = True
+        else:
+            # Active orders can change at any position in the listing, so
+            # the (small) active set is always re-read in full
+            live = set()
+            for state in COMMITTED_STATES:
+                live |= self.by_state.get(state, set())
+            seen = set()
+            async for record in self.order_wrapper.iter_all(
+                    page_size=self.page_size, state="active"):
+                seen.add(self._id(record))
+                if self._upsert(record):
+                    changed.append(record)
+
+            # Orders that dropped out of the active set, and stored orders in
+            # the other live states, can have changed anywhere in the
+            # listing; fetch them individually
+            for order_id in sorted(live - seen):
+                seen.add(order_id)
+                record = await self.order_wrapper.get_one(order_id)
+                if self._upsert(record):
+                    changed.append(record)
+
+            # New orders show up at the head of the listing, stop at the
+            # first one we already had before this sync
+            records = self.order_wrapper.iter_all(page_size=self.page_size,
+                                                  state="all")
+            try:
+                async for record in records:
+                    if self._id(record) in seen:
+                        continue
+                    if not self._upsert(record):
+                        break
+                    changed.append(record)
+            finally:
+                # stopping early leaves the next page's prefetch running
+                await records.aclose()
+
+        self._persist(changed)
+        log.debug(f"Order sync complete, {len(changed)} changed")
+        return len(changed)
+
+    def _id(self, record):
+        return str(record[self.ID_FIELD])
+
+    def _upsert(self, record):
+        order_id = self._id(record)
+        current = self.orders.get(order_id)
+        if current is not None:
+            if self.UPDATED_FIELD in record and \
+                    current.get(self.UPDATED_FIELD) == \
+                    record[self.UPDATED_FIELD]:
+                return False
+            if current == record:
+                return False
+            self._unindex(current)
+        self._index(record)
+        return True
+
+    def _index(self, record):
+        order_id = self._id(record)
+        self.orders[order_id] = record
+        self.by_state.setdefault(
+            record.get(self.STATE_FIELD), set()).add(order_id)
+        self.by_pair.setdefault(self._pair(record), set()).add(order_id)
+        for tag in record.get("tags") or []:
+            key = tag_key(tag.get("name"), tag.get("value"))
+            self.by_tag.setdefault(key, set()).add(order_id)
+
+    def _unindex(self, record):
+        order_id = self._id(record)
+        self.by_state.get(record.get(self.STATE_FIELD), set()).discard(
+            order_id)
+        self.by_pair.get(self._pair(record), set()).discard(order_id)
+        for tag in record.get("tags") or []:
+            key = tag_key(tag.get("name"), tag.get("value"))
+            self.by_tag.get(key, set()).discard(order_id)
+
+    @staticmethod
+    def _pair(record):
+        return (token_address(record.get("tokenIn")),
+                token_address(record.get("tokenOut")))
+
+    def _persist(self, records):
+        if self.db is None or len(records) == 0:
+            return
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO orders (id, record) VALUES (?, ?)",
+                [(self._id(r), json.dumps(r)) for r in records])
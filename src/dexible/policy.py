@@ -1,12 +1,68 @@
 from enum import Enum
+from .common import Memoizable, Price, json_fragment
+from .exceptions import DexibleException
 
+# Policy classes by tag, filled in as they are defined
+POLICY_TYPES = {}
 
-class DexibleBasePolicy:
-    name = None
+
+def from_json(data):
+    """Build a policy object from its serialized form, as found in the
+    policies of order records returned by the API.
+    """
+    cls = POLICY_TYPES.get(data.get("type"))
+    if cls is None:
+        raise DexibleException(f"Unknown policy type: {data.get('type')}",
+                               json_response=data)
+    return cls.from_params(data.get("params") or {})
+
+
+class DexibleBasePolicy(Memoizable):
+    __slots__ = ("name", "_frozen")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        tag = cls.__dict__.get("tag")
+        if tag is not None:
+            POLICY_TYPES[tag] = cls
 
     def __init__(self, name):
+        object.__setattr__(self, "_frozen", False)
         self.name = name
 
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise DexibleException(
+                f"{self.name} policy is frozen and cannot be modified")
+        Memoizable.__setattr__(self, name, value)
+
+    def freeze(self):
+        """Make the policy immutable so it can be shared between algos."""
+        object.__setattr__(self, "_frozen", True)
+
+    def copy(self):
+        """Shallow, unfrozen copy of the policy."""
+        cls = type(self)
+        new = cls.__new__(cls)
+        for klass in cls.__mro__:
+            for name in getattr(klass, "__slots__", ()):
+                if name not in ("_memo", "_revision") and \
+                        hasattr(self, name):
+                    object.__setattr__(new, name, getattr(self, name))
+        object.__setattr__(new, "_frozen", False)
+        return new
+
+    @classmethod
+    def from_params(cls, params):
+        raise Exception("Must implement from_params function")
+
+    def serialize_json(self):
+        """serialize() pre-encoded as JSON bytes. Cached until a field
+        changes.
+        """
+        return self._memoized("serialize_json",
+                              lambda: json_fragment(self.serialize()))
+
     def serialize(self):
         raise Exception("Must implement serialize function")
 
@@ -16,6 +72,8 @@ class DexibleBasePolicy:
 
 class BoundedDelay(DexibleBasePolicy):
     tag = "BoundedDelay"
+    __slots__ = ("time_window_seconds", "randomize_delay",
+                 "expire_after_time_window")
 
     def __init__(self, time_window_seconds, randomize_delay,
                  expire_after_time_window=None):
@@ -24,6 +82,13 @@ class BoundedDelay(DexibleBasePolicy):
         self.randomize_delay = randomize_delay
         self.expire_after_time_window = expire_after_time_window
 
+    @classmethod
+    def from_params(cls, params):
+        return cls(time_window_seconds=params.get("timeWindow"),
+                   randomize_delay=params.get("randomize"),
+                   expire_after_time_window=params.get(
+                       "expireAfterTimeWindow"))
+
     def verify(self):
         return None
 
@@ -44,11 +109,16 @@ class BoundedDelay(DexibleBasePolicy):
 
 class Expiration(DexibleBasePolicy):
     tag = "Expiration"
+    __slots__ = ("seconds",)
 
     def __init__(self, seconds):
         super(Expiration, self).__init__(self.tag)
         self.seconds = seconds
 
+    @classmethod
+    def from_params(cls, params):
+        return cls(seconds=params.get("seconds"))
+
     def verify(self):
         return None
 
@@ -63,11 +133,16 @@ class Expiration(DexibleBasePolicy):
 
 class FailLimit(DexibleBasePolicy):
     tag = "FailLimit"
+    __slots__ = ("max_failures",)
 
     def __init__(self, max_failures):
         super(FailLimit, self).__init__(self.tag)
         self.max_failures = max_failures
 
+    @classmethod
+    def from_params(cls, params):
+        return cls(max_failures=params.get("maxFailures"))
+
     def verify(self):
         return None
 
@@ -82,6 +157,7 @@ class FailLimit(DexibleBasePolicy):
 
 class GasCost(DexibleBasePolicy):
     tag = "GasCost"
+    __slots__ = ("gas_type", "amount", "deviation")
 
     def __init__(self, gas_type, amount=None, deviation=None):
         super(GasCost, self).__init__(self.tag)
@@ -91,6 +167,12 @@ class GasCost(DexibleBasePolicy):
         self.amount = amount
         self.deviation = deviation
 
+    @classmethod
+    def from_params(cls, params):
+        return cls(gas_type=params.get("gasType"),
+                   amount=params.get("amount"),
+                   deviation=params.get("deviation"))
+
     def verify(self):
         if self.gas_type == "fixed":
             if self.amount is None:
@@ -112,12 +194,19 @@ class GasCost(DexibleBasePolicy):
 
 class LimitPrice(DexibleBasePolicy):
     tag = "LimitPrice"
-    price = None
+    __slots__ = ("price",)
 
     def __init__(self, price):
         super(LimitPrice, self).__init__(self.tag)
         self.price = price
 
+    def _children(self):
+        return (self.price,)
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(price=Price.from_json(params["price"]))
+
     def verify(self):
         return None
 
@@ -132,6 +221,8 @@ class LimitPrice(DexibleBasePolicy):
 
 class PriceBounds(DexibleBasePolicy):
     tag = "PriceBounds"
+    __slots__ = ("base_price", "upper_bound_percent",
+                 "lower_bound_percent")
 
     def __init__(self, base_price,
                  upper_bound_percent=None, lower_bound_percent=None):
@@ -140,6 +231,15 @@ class PriceBounds(DexibleBasePolicy):
         self.upper_bound_percent = upper_bound_percent
         self.lower_bound_percent = lower_bound_percent
 
+    def _children(self):
+        return (self.base_price,)
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(base_price=Price.from_json(params["basePrice"]),
+                   upper_bound_percent=params.get("upperBoundPercentage"),
+                   lower_bound_percent=params.get("lowerBoundPercentage"))
+
     def verify(self):
         if self.upper_bound_percent is None and \
                 self.lower_bound_percent is None:
@@ -161,11 +261,16 @@ class PriceBounds(DexibleBasePolicy):
 
 class Slippage(DexibleBasePolicy):
     tag = "Slippage"
+    __slots__ = ("amount",)
 
     def __init__(self, amount):
         super(Slippage, self).__init__(self.tag)
         self.amount = amount
 
+    @classmethod
+    def from_params(cls, params):
+        return cls(amount=params.get("amount"))
+
     def verify(self):
         return None
 
@@ -180,12 +285,21 @@ class Slippage(DexibleBasePolicy):
 
 class StopPrice(DexibleBasePolicy):
     tag = "StopPrice"
+    __slots__ = ("trigger", "above")
 
     def __init__(self, trigger, above):
         super(StopPrice, self).__init__(self.tag)
         self.trigger = trigger
         self.above = above
 
+    def _children(self):
+        return (self.trigger,)
+
+    @classmethod
+    def from_params(cls, params):
+        return cls(trigger=Price.from_json(params["trigger"]),
+                   above=params.get("above"))
+
     def verify(self):
         return None
 
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from . import abi
+from .common import CHAIN_CONFIG, Token, token_address
+from .sdk import DexibleSDK, _SessionGroup
+from .token import TokenException, decode_result, multicall_contract, \
+    multicall_results
+
+log = logging.getLogger('AccountPool')
+
+# Some older tokens (e.g. MKR) return their symbol as bytes32
+_BYTES32_SYMBOL_ABI = [{"constant": True,
+                        "inputs": [],
+                        "name": "symbol",
+                        "outputs": [{"name": "", "type": "bytes32"}],
+                        "stateMutability": "view",
+                        "type": "function"}]
+
+
+class AccountPool(_SessionGroup):
+    """Many signers on one chain sharing a transport and caches.
+
+    Every account gets its own DexibleSDK, so requests are still signed by
+    that account. All of them send through one aiohttp session, and so one
+    connection pool, once the pool is opened.
+
+    The pool's own reads (token_metadata, balances and lookup) share one web3
+    instance on the given provider and one token metadata cache, and batch
+    balance and allowance reads for any number of accounts and tokens into
+    Multicall aggregate calls. They run on the default executor, off the
+    event loop. The per-account sdk.token wrappers are unchanged: they keep
+    their own web3 instances and the TokenHelper cache.
+
+    Example:
+        async with AccountPool(provider, chain_id) as pool:
+            for account in accounts:
+                pool.add(account)
+            tokens = await pool.balances([weth, usdc])
+            sdk = pool[accounts[0].address]
+    """
+
+    def __init__(self, provider, chain_id, network='ethereum',
+                 connection_limit=100, max_calls=500):
+        """
+        Args:
+            provider: Web3 provider shared by every account.
+            chain_id (int): Chain the accounts trade on.
+            network (str): Network name, see chain_to_name.
+            connection_limit (int): Size of the shared connection pool.
+            max_calls (int): Maximum number of reads per Multicall call.
+        """
+        self.provider = provider
+        self.chain_id = chain_id
+        self.network = network
+        self.connection_limit = connection_limit
+        self.max_calls = max_calls
+        self.session = None
+        self.sdks = {}
+        self.metadata = {}
+        self._w3 = None
+        self._erc20 = None
+        self._multicall = None
+
+    def add(self, account):
+        """Add a signer to the pool.
+
+        Returns:
+            DexibleSDK: The SDK for the account.
+        """
+        client = self._api_client(account, self.chain_id)
+        sdk = DexibleSDK(self.provider, account, self.chain_id, self.network,
+                         api_client=client)
+        self.sdks[account.address.lower()] = sdk
+        return sdk
+
+    def remove(self, address):
+        self.sdks.pop(str(address).lower(), None)
+
+    def __getitem__(self, address):
+        return self.sdks[str(address).lower()]
+
+    def __contains__(self, address):
+        return str(address).lower() in self.sdks
+
+    def __len__(self):
+        return len(self.sdks)
+
+    def __iter__(self):
+        return iter(self.sdks.values())
+
+    def _contracts(self):
+        if self._w3 is None:
+            import web3
+            self._w3 = web3.Web3(self.provider)
+            self._erc20 = self._w3.eth.contract(abi=abi.ERC20_ABI)
+            self._multicall = multicall_contract(self._w3, self.chain_id)
+        return self._w3, self._erc20, self._multicall
+
+    def _read(self, calls):
+        # Split into max_calls sized aggregates; one RPC round trip each.
+        # Blocking, see _read_async
+        w3, _, multicall = self._contracts()
+        values = []
+        for i in range(0, len(calls), self.max_calls):
+            chunk = calls[i:i + self.max_calls]
+            for call, data in zip(chunk, multicall_results(w3, multicall,
+                                                           chunk)):
+                values.append(self._decode(w3, call, data))
+        return values
+
+    async def _read_async(self, calls):
+        if len(calls) == 0:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read, calls)
+
+    def _decode(self, w3, call, data):
+        import eth_abi.exceptions
+        try:
+            return decode_result(w3, call, data)[0]
+        except eth_abi.exceptions.DecodingError:
+            if call["method"] != "symbol":
+                raise TokenException(f"Can't read {call['method']} of "
+                                     f"token at {call['address']}")
+        try:
+            symbol = decode_result(w3, dict(call, abi=_BYTES32_SYMBOL_ABI),
+                                   data)[0]
+        except eth_abi.exceptions.DecodingError:
+            raise TokenException(
+                f"Can't read symbol of token at {call['address']}")
+        return symbol.rstrip(b"\0").decode("utf-8", "replace")
+
+    def _call(self, token, method, args):
+        return {"abi": abi.ERC20_ABI,
+                "contract": self._contracts()[1],
+                "address": token,
+                "method": method,
+                "args": args}
+
+    async def token_metadata(self, tokens):
+        """Decimals and symbol of each token, read once for the whole pool.
+
+        Args:
+            tokens (list): Token addresses or Token instances.
+
+        Returns:
+            dict: Lowercase token address to {"decimals": ...,
+                "symbol": ...}.
+        """
+        addresses = [token_address(t) for t in tokens]
+        missing = list(dict.fromkeys(
+            a for a in addresses if a not in self.metadata))
+        if len(missing) > 0:
+            calls = []
+            for address in missing:
+                calls.append(self._call(address, "decimals", []))
+                calls.append(self._call(address, "symbol", []))
+            values = await self._read_async(calls)
+            for i, address in enumerate(missing):
+                self.metadata[address] = {
+                    "decimals": values[2 * i],
+                    "symbol": values[2 * i + 1]}
+            log.debug(f"Loaded metadata of {len(missing)} tokens")
+        return {a: self.metadata[a] for a in addresses}
+
+    async def balances(self, tokens, owners=None):
+        """Balance and Settlement allowance of every owner for every token.
+
+        Metadata comes from the shared cache; the balance and allowance reads
+        of all owners go out together in as few Multicall calls as
+        max_calls allows.
+
+        Args:
+            tokens (list): Token addresses or Token instances.
+            owners (list): Owner addresses. Defaults to every account in the
+                pool.
+
+        Returns:
+            dict: Owner address to a dict of lowercase token address to a
+                Token with balance and allowance filled in.
+        """
+        if owners is None:
+            owners = [sdk.account.address for sdk in self.sdks.values()]
+        metadata = await self.token_metadata(tokens)
+        settlement = CHAIN_CONFIG[self.chain_id]["Settlement"]
+
+        pairs = [(owner, address)
+                 for owner in owners for address in metadata]
+        calls = []
+        for owner, address in pairs:
+            calls.append(self._call(address, "balanceOf", [owner]))
+            calls.append(self._call(address, "allowance",
+                                    [owner, settlement]))
+        values = await self._read_async(calls)
+
+        result = {owner: {} for owner in owners}
+        for i, (owner, address) in enumerate(pairs):
+            meta = metadata[address]
+            result[owner][address] = Token(address=address,
+                                           decimals=meta["decimals"],
+                                           symbol=meta["symbol"],
+                                           balance=values[2 * i],
+                                           allowance=values[2 * i + 1])
+        log.debug(f"Read {len(pairs)} balances in "
+                  f"{-(-len(calls) // self.max_calls)} multicall(s)")
+        return result
+
+    async def lookup(self, owner, token):
+        """Token with the balance and allowance of a single owner."""
+        address = token_address(token)
+        return (await self.balances([address], [owner]))[owner][address]
@@ -19,22 +19,32 @@ class QuoteWrapper:
 async def get_quote(api_client, token_in, token_out, amount_in,
                     slippage_percent, max_rounds=None, min_order_size=-1,
                     max_fixed_gas=None, fixed_price=None):
+    return await api_client.post("quotes", data=quote_body(
+        api_client.chain_id, token_in, token_out, amount_in,
+        slippage_percent, max_rounds=max_rounds,
+        min_order_size=min_order_size, max_fixed_gas=max_fixed_gas,
+        fixed_price=fixed_price))
+
+
+def quote_body(chain_id, token_in, token_out, amount_in, slippage_percent,
+               max_rounds=None, min_order_size=-1, max_fixed_gas=None,
+               fixed_price=None):
+    """Request body of a quote; shared by the async and blocking SDKs."""
     if max_rounds:
         min_order_size //= max_rounds
         if min_order_size < 1:
             min_order_size = amount_in * 30 // 100
 
-    quote_body = {
+    body = {
         "amountIn": str(amount_in),
-        "networkId": api_client.chain_id,
+        "networkId": chain_id,
         "tokenIn": token_in.address,
         "tokenOut": token_out.address,
         "minOrderSize": str(min_order_size),
         "slippagePercentage": slippage_percent / 100}
 
     if max_fixed_gas:
-        quote_body["maxFixedGas"] = max_fixed_gas
+        body["maxFixedGas"] = max_fixed_gas
     if fixed_price:
-        quote_body['fixedPrice'] = fixed_price
-
-    return await api_client.post("quotes", data=quote_body)
+        body['fixedPrice'] = fixed_price
+    return body
@@ -0,0 +1,205 @@
+import asyncio
+import datetime
+import json
+import logging
+import math
+import sqlite3
+import time
+from .common import _dict_rows_payload, _report_rows
+
+log = logging.getLogger('ReportCache')
+
+
+def _ts(value):
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _dt(ts):
+    return datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc)
+
+
+def _payload_rows(payload):
+    rows = _report_rows(payload)
+    header = next(rows, None)
+    if header is None:
+        return []
+    return [dict(zip(header, values)) for values in rows if len(values) > 0]
+
+
+class ReportCache:
+    """Local cache of order summary reports in fixed time buckets.
+
+    Time is cut into buckets of one length, aligned to the Unix epoch (UTC
+    days by default). Every bucket a request fully covers that is already
+    closed (older than settle) is read from SQLite, or fetched once and
+    stored. The partial buckets at either edge of the request and anything
+    newer than settle are fetched fresh and never stored, as the report rows
+    carry no guaranteed timestamp column to cut a bucket by.
+
+    Sliding windows therefore reuse every whole bucket they share, and the
+    cache never holds more than one copy of a bucket.
+    """
+
+    def __init__(self, reports, path, settle=datetime.timedelta(hours=1),
+                 bucket=datetime.timedelta(days=1), concurrency=4,
+                 order_id_column="orderId"):
+        """
+        Args:
+            reports (Reports): Reports instance used to fetch, e.g.
+                sdk.reports.
+            path (str): SQLite file holding the cache.
+            settle (datetime.timedelta): Age after which a period is
+                considered closed and safe to store.
+            bucket (datetime.timedelta): Length of the stored buckets; also
+                the size of each report request.
+            concurrency (int): Maximum number of report requests in flight.
+            order_id_column (str): Column used to drop duplicate rows.
+        """
+        self.reports = reports
+        self.settle = settle
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.order_id_column = order_id_column
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS buckets "
+                        "(start REAL PRIMARY KEY, end REAL NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS bucket_rows "
+                        "(bucket REAL NOT NULL, position INTEGER NOT NULL, "
+                        "row TEXT NOT NULL, PRIMARY KEY (bucket, position))")
+        self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def buckets(self):
+        """Stored (start, end) buckets as timestamps, sorted by start."""
+        return list(self.db.execute(
+            "SELECT start, end FROM buckets ORDER BY start"))
+
+    def clear(self, start=None, end=None):
+        """Drop stored buckets overlapping [start, end), or everything."""
+        lo = _ts(start) if start is not None else float("-inf")
+        hi = _ts(end) if end is not None else float("inf")
+        starts = [(s,) for s, e in self.buckets() if s < hi and e > lo]
+        with self.db:
+            self.db.executemany("DELETE FROM bucket_rows WHERE bucket = ?",
+                                starts)
+            self.db.executemany("DELETE FROM buckets WHERE start = ?",
+                                starts)
+
+    def plan(self, start, end, now=None):
+        """Split a window into cached, missing and fresh parts.
+
+        Returns:
+            tuple: (cached, missing, fresh) where cached and missing are the
+                closed whole buckets, as (start, end), that are stored and
+                that still need to be fetched and stored, and fresh the
+                edges of the window, as (start, end), to fetch without
+                storing.
+        """
+        lo, hi = sorted([_ts(start), _ts(end)])
+        now = time.time() if now is None else _ts(now)
+        closed = min(hi, now - self.settle.total_seconds())
+        size = self.bucket.total_seconds()
+
+        first = math.ceil(lo / size)
+        last = math.floor(closed / size)
+        if last <= first:
+            return [], [], [(lo, hi)] if lo < hi else []
+
+        stored = {s for (s,) in self.db.execute(
+            "SELECT start FROM buckets WHERE start >= ? AND start < ?",
+            (first * size, last * size))}
+        cached, missing = [], []
+        for i in range(first, last):
+            bucket = (i * size, (i + 1) * size)
+            (cached if bucket[0] in stored else missing).append(bucket)
+
+        fresh = []
+        if lo < first * size:
+            fresh.append((lo, first * size))
+        if last * size < hi:
+            fresh.append((last * size, hi))
+        return cached, missing, fresh
+
+    async def get_summary_between(self, start, end, columnar=False,
+                                  amounts=None, token_decimals=None):
+        """Retrieve the report summary between two datetimes, serving closed
+        buckets from the cache.
+
+        Args:
+            start (datetime.datetime): Start datetime object.
+            end (datetime.datetime): End datetime object.
+            columnar (bool): Return a dexible.report_table.ReportTable. See
+                Reports.get_summary_between.
+            amounts (dict): With columnar, amount columns to convert.
+            token_decimals (dict): With columnar, token decimals lookup.
+
+        Returns:
+            list: Report rows as dicts in time order, or a ReportTable when
+                columnar is set.
+        """
+        cached, missing, fresh = self.plan(start, end)
+        log.debug(f"Report window: {len(cached)} cached, "
+                  f"{len(missing)} missing buckets, fresh: {fresh}")
+
+        # one semaphore for every request of this window
+        semaphore = asyncio.Semaphore(self.concurrency)
+        fetched = await asyncio.gather(
+            *[self._fetch(s, e, semaphore) for s, e in missing + fresh])
+        for (s, e), rows in zip(missing, fetched):
+            self._store(s, e, rows)
+
+        pieces = [(s, self._load(s)) for s, _ in cached]
+        pieces += [(s, rows) for (s, _), rows in zip(missing + fresh,
+                                                     fetched)]
+        pieces.sort(key=lambda p: p[0])
+
+        rows, ids = [], set()
+        for _, chunk_rows in pieces:
+            for row in chunk_rows:
+                order_id = row.get(self.order_id_column)
+                if order_id is not None:
+                    if order_id in ids:
+                        continue
+                    ids.add(order_id)
+                rows.append(row)
+
+        if not columnar:
+            return rows
+        from .report_table import parse_summary
+        return parse_summary(_dict_rows_payload(rows),
+                             amounts=amounts,
+                             token_decimals=token_decimals)
+
+    async def get_summary_delta(self, start, delta, **kwargs):
+        """Cached counterpart of Reports.get_summary_delta."""
+        return await self.get_summary_between(start, (start + delta),
+                                              **kwargs)
+
+    async def _fetch(self, start, end, semaphore):
+        async with semaphore:
+            payload = await self.reports.get_summary_between(_dt(start),
+                                                             _dt(end))
+        return _payload_rows(payload)
+
+    def _load(self, start):
+        return [json.loads(row) for (row,) in self.db.execute(
+            "SELECT row FROM bucket_rows WHERE bucket = ? ORDER BY position",
+            (start,))]
+
+    def _store(self, start, end, rows):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO buckets (start, end) VALUES (?, ?)",
+                (start, end))
+            self.db.execute("DELETE FROM bucket_rows WHERE bucket = ?",
+                            (start,))
+            self.db.executemany(
+                "INSERT INTO bucket_rows (bucket, position, row) "
+                "VALUES (?, ?, ?)",
+                [(start, i, json.dumps(row)) for i, row in enumerate(rows)])
@@ -0,0 +1,217 @@
+"""Columnar parsing of order summary reports."""
+import logging
+from decimal import Decimal
+import numpy as np
+from .common import _report_rows, as_decs_array
+from .exceptions import DexibleException
+
+log = logging.getLogger('ReportTable')
+
+AGGREGATES = ["sum", "mean", "min", "max", "count"]
+
+
+def _typed(values):
+    # ints first (kept exact as Python ints when they overflow int64), then
+    # floats, falling back to strings. A column with empty cells is float,
+    # so they become NaN rather than 0 and aggregates skip them
+    if "" not in values:
+        try:
+            ints = [int(v) for v in values]
+            try:
+                return np.array(ints, dtype=np.int64)
+            except OverflowError:
+                return np.array(ints, dtype=object)
+        except (ValueError, TypeError):
+            pass
+    try:
+        return np.array([float(v) if v != "" else np.nan for v in values],
+                        dtype=float)
+    except (ValueError, TypeError):
+        return np.array(values, dtype=object)
+
+
+def _token_amounts(cells, decimals):
+    # Base unit cells of a column with empty cells to float token amounts,
+    # converted from the exact text; empty cells stay NaN
+    present = [i for i, v in enumerate(cells) if v != ""]
+    out = np.full(len(cells), np.nan)
+    if len(present) == 0:
+        return out
+    if hasattr(decimals, "__len__"):
+        decimals = [decimals[i] for i in present]
+        if any(d != d for d in decimals):
+            raise DexibleException("Missing decimals for an amount")
+    out[present] = as_decs_array([int(Decimal(cells[i])) for i in present],
+                                 decimals, as_float=True)
+    return out
+
+
+class ReportTable:
+    """Column table of a report: column name to numpy array."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @property
+    def names(self):
+        return list(self.columns.keys())
+
+    def __len__(self):
+        if len(self.columns) == 0:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def rows(self):
+        """Iterate over rows as dicts."""
+        names = self.names
+        for values in zip(*[self.columns[n] for n in names]):
+            yield dict(zip(names, values))
+
+    def where(self, mask):
+        return ReportTable({k: v[mask] for k, v in self.columns.items()})
+
+    def group_by(self, keys, aggregates):
+        """Aggregate columns per distinct combination of key columns.
+
+        Args:
+            keys (list): Key column names.
+            aggregates (dict): Output name to (column, aggregate) with
+                aggregate one of "sum", "mean", "min", "max" or "count".
+
+        Returns:
+            ReportTable: One row per group, with the key columns followed by
+                the aggregates.
+        """
+        if type(keys) == str:
+            keys = [keys]
+        key_cols = [self.columns[k].astype(str) for k in keys]
+        if len(key_cols) == 1:
+            combined = key_cols[0]
+        else:
+            combined = np.char.add(key_cols[0], "\x1f")
+            for col in key_cols[1:-1]:
+                combined = np.char.add(np.char.add(combined, col), "\x1f")
+            combined = np.char.add(combined, key_cols[-1])
+        _, first, inverse = np.unique(combined, return_index=True,
+                                      return_inverse=True)
+        inverse = inverse.reshape(-1)
+        groups = len(first)
+        counts = np.bincount(inverse, minlength=groups)
+
+        out = {k: self.columns[k][first] for k in keys}
+        for name, (column, agg) in aggregates.items():
+            if agg not in AGGREGATES:
+                raise DexibleException(f"Unsupported aggregate: {agg}")
+            if agg == "count":
+                out[name] = counts
+                continue
+            # missing values (NaN) are left out of every aggregate
+            values = self.columns[column].astype(float)
+            present = ~np.isnan(values)
+            if agg in ["sum", "mean"]:
+                total = np.bincount(inverse, weights=np.where(present,
+                                                              values, 0),
+                                    minlength=groups)
+                if agg == "sum":
+                    out[name] = total
+                else:
+                    n = np.bincount(inverse, weights=present,
+                                    minlength=groups)
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        out[name] = total / n
+            else:
+                fill = np.inf if agg == "min" else -np.inf
+                result = np.full(groups, fill)
+                ufunc = np.minimum if agg == "min" else np.maximum
+                ufunc.at(result, inverse, np.where(present, values, fill))
+                result[result == fill] = np.nan
+                out[name] = result
+        return ReportTable(out)
+
+    def volume_by_pair(self, token_in, token_out, amount):
+        """Total of the amount column per (token_in, token_out) pair."""
+        return self.group_by([token_in, token_out],
+                             {"volume": (amount, "sum"),
+                              "orders": (amount, "count")})
+
+    def gas_spent(self, gas, by=None):
+        """Total of the gas column, overall or per group of by."""
+        if by is None:
+            return float(np.nansum(self.columns[gas].astype(float)))
+        return self.group_by(by, {"gas": (gas, "sum")})
+
+    def fill_ratio(self, filled, requested, by=None):
+        """Filled over requested amount, overall or per group of by."""
+        if by is None:
+            total = np.nansum(self.columns[requested].astype(float))
+            return float(np.nansum(self.columns[filled].astype(float)) /
+                         total)
+        table = self.group_by(by, {"filled": (filled, "sum"),
+                                   "requested": (requested, "sum")})
+        table.columns["fill_ratio"] = \
+            table["filled"] / table["requested"]
+        return table
+
+    def __str__(self):
+        return f"<ReportTable rows: {len(self)}, columns: {self.names}>"
+    __repr__ = __str__
+
+
+def parse_summary(payload, amounts=None, token_decimals=None):
+    """Parse an order summary report into a ReportTable in one pass.
+
+    Args:
+        payload: Report as returned by Reports.get_summary_between.
+        amounts (dict): Amount column name to its decimals: an int, the name
+            of a column holding decimals, or the name of a column holding a
+            token address or symbol that is looked up in token_decimals.
+            Listed columns are converted from base units to float token
+            amounts.
+        token_decimals (dict): Token address or symbol (case-insensitive)
+            to decimals.
+
+    Returns:
+        ReportTable
+    """
+    rows = _report_rows(payload)
+    header = next(rows, None)
+    if header is None:
+        return ReportTable({})
+    values = [[] for _ in header]
+    for row in rows:
+        if len(row) == 0:
+            continue
+        for i, col in enumerate(values):
+            col.append(row[i] if i < len(row) else "")
+
+    columns = {name: _typed(col) for name, col in zip(header, values)}
+
+    lookup = {str(k).lower(): v for k, v in (token_decimals or {}).items()}
+    for column, decimals in (amounts or {}).items():
+        if type(decimals) == str:
+            source = columns[decimals]
+            if source.dtype.kind in "iuf":
+                decimals = source
+            else:
+                try:
+                    decimals = [lookup[str(t).lower()] for t in source]
+                except KeyError as e:
+                    raise DexibleException(
+                        f"No decimals known for token {e.args[0]}")
+        raw = columns[column]
+        if raw.dtype.kind == "f" or getattr(decimals, "dtype", None) == float:
+            columns[column] = _token_amounts(values[header.index(column)],
+                                             decimals)
+            continue
+        if raw.dtype.kind not in "iuO":
+            raw = raw.astype(object)
+        columns[column] = np.asarray(
+            as_decs_array(list(raw), decimals, as_float=True), dtype=float)
+    log.debug(f"Parsed report with {len(header)} columns")
+    return ReportTable(columns)
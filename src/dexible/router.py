@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from .common import chain_to_name
+from .exceptions import DexibleException
+from .sdk import DexibleSDK, _SessionGroup
+
+log = logging.getLogger('ChainRouter')
+
+
+class ChainMetrics:
+    """Request counters per chain, shared by every client of a router."""
+
+    def __init__(self):
+        self.requests = {}
+        self.errors = {}
+        self.seconds = {}
+
+    def record(self, chain_id, seconds, ok):
+        self.requests[chain_id] = self.requests.get(chain_id, 0) + 1
+        self.seconds[chain_id] = self.seconds.get(chain_id, 0) + seconds
+        if not ok:
+            self.errors[chain_id] = self.errors.get(chain_id, 0) + 1
+
+    def snapshot(self):
+        """Per chain request count, error count and mean latency."""
+        return {chain_id: {"requests": count,
+                           "errors": self.errors.get(chain_id, 0),
+                           "mean_seconds": self.seconds[chain_id] / count}
+                for chain_id, count in self.requests.items()}
+
+
+class _MeteredClient:
+    # Records every get/post of an APIClient in the router's metrics
+    def __init__(self, client, metrics):
+        self.client = client
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def __setattr__(self, name, value):
+        if name in ["client", "metrics"]:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.client, name, value)
+
+    async def _timed(self, call):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = await call
+            ok = True
+            return result
+        finally:
+            self.metrics.record(self.client.chain_id,
+                                time.perf_counter() - start, ok)
+
+    async def get(self, endpoint):
+        return await self._timed(self.client.get(endpoint))
+
+    async def post(self, endpoint, data=None):
+        return await self._timed(self.client.post(endpoint, data=data))
+
+
+class ChainRouter(_SessionGroup):
+    """One signer across several chains, with SDKs created on demand.
+
+    The DexibleSDK of a chain is built the first time a request for that
+    chain is dispatched. Every chain's client signs with the same account,
+    sends through the router's single aiohttp session once it is opened, and
+    reports to the same ChainMetrics.
+
+    Example:
+        async with ChainRouter(account, {1: mainnet, 42: kovan}) as router:
+            quote = await router[1].quote.get_quote(...)
+            active = await router.active_orders()
+    """
+
+    def __init__(self, account, providers, network='ethereum',
+                 connection_limit=100):
+        """
+        Args:
+            account: Signer used on every chain.
+            providers (dict): Chain id to web3 provider.
+            network (str): Network name, see chain_to_name.
+            connection_limit (int): Size of the shared connection pool.
+        """
+        self.account = account
+        self.providers = dict(providers)
+        self.network = network
+        self.connection_limit = connection_limit
+        self.metrics = ChainMetrics()
+        self.session = None
+        self.sdks = {}
+
+    @property
+    def chains(self):
+        return list(self.providers.keys())
+
+    def sdk(self, chain_id):
+        """The DexibleSDK for a chain, created on first use."""
+        sdk = self.sdks.get(chain_id)
+        if sdk is None:
+            if chain_id not in self.providers:
+                raise DexibleException(f"No provider for chain {chain_id}")
+            # fails early on chains the API does not serve
+            chain_to_name(self.network, chain_id)
+            client = self._api_client(self.account, chain_id)
+            sdk = DexibleSDK(self.providers[chain_id], self.account,
+                             chain_id, self.network,
+                             api_client=_MeteredClient(client, self.metrics))
+            self.sdks[chain_id] = sdk
+            log.debug(f"Created SDK for chain {chain_id}")
+        return sdk
+    __getitem__ = sdk
+
+    async def gather(self, fn, chains=None):
+        """Run fn(sdk) on several chains concurrently.
+
+        Args:
+            fn: Coroutine function taking a DexibleSDK.
+            chains (list): Chain ids. Defaults to every configured chain.
+
+        Returns:
+            dict: Chain id to the result, or to the exception it raised.
+        """
+        chains = self.chains if chains is None else chains
+
+        async def run(chain_id):
+            # the SDK is built inside the task, so a chain that cannot be
+            # served fails alone instead of aborting the whole gather
+            return await fn(self.sdk(chain_id))
+
+        results = await asyncio.gather(*[run(chain_id) for chain_id in chains],
+                                       return_exceptions=True)
+        return dict(zip(chains, results))
+
+    async def active_orders(self, chains=None, page_size=100):
+        """Active orders of the account on every chain, fetched
+        concurrently.
+
+        Returns:
+            dict: Chain id to a list of order records, or to the exception
+                raised for that chain.
+        """
+        async def fetch(sdk):
+            return [record async for record in sdk.order.iter_all(
+                page_size=page_size, state="active")]
+        return await self.gather(fetch, chains)
+
@@ -1,3 +1,4 @@
+import warnings
 from enum import Enum
 from .common import Contact, Reports
 from .token import TokenSupport
@@ -12,31 +13,49 @@ class DexibleSDK:
         FIXED = "fixed"
 
     def __init__(self, provider, account, chain_id,
-                 network='ethereum', aio=True, *args, **kwargs):
+                 network='ethereum', aio=True, api_client=None,
+                 journal=None, *args, **kwargs):
         self.account = account
         self.provider = provider
         self.chain_id = chain_id
 
-        if aio:
-            from .apiclient_aio import APIClient
-        else:
-            from .apiclient import APIClient
+        if not aio:
+            # the blocking client stalled the event loop on every call
+            warnings.warn("aio=False is deprecated and ignored; DexibleSDK "
+                          "always uses non-blocking I/O. Use DexibleSyncSDK "
+                          "for a blocking API.", DeprecationWarning,
+                          stacklevel=2)
 
-        self.api_client = APIClient(chain_id=chain_id,
-                                    network=network,
-                                    account=account)
+        if api_client is None:
+            from .apiclient_aio import APIClient
+            api_client = APIClient(chain_id=chain_id,
+                                   network=network,
+                                   account=account)
+        self.api_client = api_client
         self.algo = AlgoWrapper()
         self.token = TokenSupport(provider=provider,
                                   account=account,
                                   api_client=self.api_client,
                                   chain_id=chain_id)
-        self.order = OrderWrapper(self.api_client)
+        self.order = OrderWrapper(self.api_client, journal=journal)
         self.quote = QuoteWrapper(self.api_client)
         self.contact = Contact(self.api_client)
         self.reports = Reports(self.api_client)
 
         super(DexibleSDK, self).__init__(*args, **kwargs)
 
+    async def close(self):
+        """Close the API client's pooled HTTP session."""
+        close = getattr(self.api_client, "close", None)
+        if close is not None:
+            await close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
     @staticmethod
     async def create(web3_object):
         account = web3_object.eth.account
@@ -45,16 +64,65 @@ class DexibleSDK:
         return DexibleSDK(provider, account, chain_id)
 
 
+class _SessionGroup:
+    # Base of AccountPool and ChainRouter: several DexibleSDKs in self.sdks
+    # whose clients send through one aiohttp session of connection_limit
+    # connections once opened
+    session = None
+
+    def _api_client(self, account, chain_id):
+        from .apiclient_aio import APIClient
+        return APIClient(account=account,
+                         chain_id=chain_id,
+                         network=self.network,
+                         session=self.session)
+
+    async def open(self):
+        """Create the shared HTTP session. Until then each client sends
+        through a pooled session of its own.
+        """
+        if self.session is not None:
+            return
+        import aiohttp
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connection_limit))
+        for sdk in self.sdks.values():
+            # drop the client's own session in favour of the shared one
+            await sdk.api_client.close()
+            sdk.api_client.session = self.session
+
+    async def close(self):
+        """Close the shared session and any session a client opened on its
+        own.
+        """
+        session, self.session = self.session, None
+        for sdk in self.sdks.values():
+            sdk.api_client.session = None
+            await sdk.api_client.close()
+        if session is not None:
+            await session.close()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
 class Dexible:
     @staticmethod
     async def connect(web3_object=None, wallet_key=None, account=None, provider=None):
         if web3_object is None:
+            import web3
+            from web3.middleware import \
+                construct_sign_and_send_raw_middleware
             if provider is None:
                 provider = web3.providers.AutoProvider()
             if account is None:
                 if wallet_key is None:
                     raise Exception("If not providing an Account implementation, must supply a wallet key")
-                account = web3.Account.from_key(web3.Web3.toBytes(hexstr=key))
+                account = web3.Account.from_key(web3.Web3.toBytes(hexstr=wallet_key))
             web3_object = web3.Web3(provider)
             web3_object.middleware_onion.add(
                 construct_sign_and_send_raw_middleware(account))
@@ -0,0 +1,165 @@
+"""Offline Monte-Carlo simulation of TWAP (BoundedDelay) schedules."""
+import logging
+import numpy as np
+import dexible.policy as policy
+from .algo import TWAP
+from .exceptions import DexibleAlgoException
+
+log = logging.getLogger('TWAPSimulator')
+
+
+def _interp_paths(times, paths, path_idx, t):
+    # linear interpolation of many price paths at once; paths is (P, T),
+    # t is (N, R) and path_idx selects the path of each of the N rows
+    t = np.clip(t, times[0], times[-1])
+    hi = np.clip(np.searchsorted(times, t, side="right"), 1, len(times) - 1)
+    lo = hi - 1
+    span = times[hi] - times[lo]
+    w = np.where(span > 0, (t - times[lo]) / np.where(span > 0, span, 1), 0)
+    rows = path_idx[:, None]
+    return paths[rows, lo] * (1 - w) + paths[rows, hi] * w
+
+
+class TWAPSimulation:
+    """Outcome of simulate_twap. Arrays are indexed [simulation, round]."""
+
+    def __init__(self, amount_in, start_price, round_times, round_prices,
+                 filled, round_size):
+        self.amount_in = amount_in
+        self.start_price = start_price
+        self.round_times = round_times
+        self.round_prices = round_prices
+        self.filled = filled
+        self.round_size = round_size
+        self.output = (round_prices * filled).sum(axis=1) * round_size
+        self.amount_filled = filled.sum(axis=1) * round_size
+        self.skipped_rounds = (~filled).sum(axis=1)
+
+    @property
+    def rounds(self):
+        return self.filled.shape[1]
+
+    @property
+    def average_price(self):
+        """Average execution price per simulation (NaN if nothing filled)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.output / self.amount_filled
+
+    @property
+    def slippage(self):
+        """Shortfall of the average execution price against the price at
+        the start of the schedule, as a fraction.
+        """
+        return 1 - self.average_price / self.start_price
+
+    @property
+    def duration(self):
+        return self.round_times[:, -1]
+
+    def summary(self):
+        return {
+            "simulations": len(self.output),
+            "rounds": self.rounds,
+            "expected_output": float(self.output.mean()),
+            "output_std": float(self.output.std()),
+            "expected_fill_ratio": float(self.amount_filled.mean() /
+                                         self.amount_in),
+            "expected_slippage": float(np.nanmean(self.slippage)),
+            "expected_skipped_rounds": float(self.skipped_rounds.mean()),
+            "expected_duration": float(self.duration.mean()),
+        }
+
+    def __str__(self):
+        return f"<TWAPSimulation {self.summary()}>"
+    __repr__ = __str__
+
+
+def simulate_twap(twap, amount_in, prices, times=None, rounds=None,
+                  ladder=None, simulations=10000, seed=None):
+    """Simulate many executions of a TWAP algo against a price path.
+
+    The order is split into equal rounds spread over the BoundedDelay time
+    window. With randomize_delay, each delay is drawn uniformly between half
+    and one and a half times the average spacing. A round is skipped when the
+    price is outside the PriceBounds range, or when it falls after the
+    Expiration (or after the time window if expire_after_time_window is set).
+    Skipped rounds are not retried.
+
+    Args:
+        twap (TWAP): Algo built with AlgoWrapper.create(type="TWAP", ...).
+        amount_in (float): Input amount in whole tokens.
+        prices: Output tokens per input token. A scalar, a path of shape
+            (T,) or a set of paths of shape (P, T); simulations cycle through
+            the paths.
+        times: Seconds since the start for each price sample, shape (T,).
+            Defaults to samples spread evenly over the time window.
+        rounds (int): Number of rounds. Defaults to the algo's max_rounds.
+        ladder (tuple): Optional (sizes, impacts) quote ladder: the fractional
+            price impact for a round of the given input size, interpolated
+            linearly.
+        simulations (int): Number of schedules to simulate.
+        seed: Seed for the random delays.
+
+    Returns:
+        TWAPSimulation
+    """
+    if not isinstance(twap, TWAP):
+        raise DexibleAlgoException("Can only simulate TWAP algos")
+    delay = twap.find_policy(policy.BoundedDelay)
+    window = float(delay.time_window_seconds)
+
+    rounds = rounds or twap.max_rounds
+    if not rounds or rounds < 1:
+        raise DexibleAlgoException("rounds is required when the algo has "
+                                   "no max_rounds")
+
+    paths = np.atleast_2d(np.asarray(prices, dtype=float))
+    if times is None:
+        times = np.linspace(0, window, paths.shape[1])
+    times = np.asarray(times, dtype=float)
+    if paths.shape[1] != len(times):
+        if paths.shape[1] != 1:
+            raise DexibleAlgoException("prices and times differ in length")
+        paths = np.repeat(paths, len(times), axis=1)
+
+    # Round start times: first round immediately, then one delay per round
+    spacing = window / rounds
+    if delay.randomize_delay:
+        rng = np.random.default_rng(seed)
+        delays = rng.uniform(0.5 * spacing, 1.5 * spacing,
+                             (simulations, rounds - 1))
+    else:
+        delays = np.full((simulations, rounds - 1), spacing)
+    round_times = np.concatenate(
+        [np.zeros((simulations, 1)), np.cumsum(delays, axis=1)], axis=1)
+
+    path_idx = np.arange(simulations) % paths.shape[0]
+    round_prices = _interp_paths(times, paths, path_idx, round_times)
+    start_price = paths[path_idx, 0]
+
+    filled = np.ones(round_times.shape, dtype=bool)
+    bounds = twap.find_policy(policy.PriceBounds)
+    if bounds is not None:
+        base = float(bounds.base_price.rate)
+        if bounds.upper_bound_percent is not None:
+            filled &= round_prices <= base * (
+                1 + bounds.upper_bound_percent / 100)
+        if bounds.lower_bound_percent is not None:
+            filled &= round_prices >= base * (
+                1 - bounds.lower_bound_percent / 100)
+
+    expiration = twap.find_policy(policy.Expiration)
+    if expiration is not None:
+        filled &= round_times <= expiration.seconds
+    if delay.expire_after_time_window:
+        filled &= round_times <= window
+
+    round_size = amount_in / rounds
+    if ladder is not None:
+        sizes, impacts = ladder
+        round_prices = round_prices * (
+            1 - np.interp(round_size, sizes, impacts))
+
+    log.debug(f"Simulated {simulations} schedules of {rounds} rounds")
+    return TWAPSimulation(amount_in, start_price, round_times,
+                          round_prices, filled, round_size)
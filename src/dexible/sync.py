@@ -0,0 +1,279 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .apiclient import APIClient
+from .algo import AlgoWrapper
+from .budget import BudgetLedger
+from .common import Contact, Reports, _WindowRows
+from .exceptions import DexibleException
+from .order import DexOrder, OrderWrapper, _action_request, _order_path, \
+    _orders_path
+from .quote import QuoteWrapper, quote_body
+from .sdk import DexibleSDK
+from .token import TokenSupport
+
+log = logging.getLogger('DexibleSyncSDK')
+
+
+class SyncDexOrder(DexOrder):
+    """DexOrder whose prepare() and submit() block."""
+    __slots__ = ()
+
+    def prepare(self):
+        slippage = self._slippage()
+        if not self.quote:
+            if not self.quote_id:
+                self._generate_quote(slippage)
+            else:
+                self._get_quote()
+        return self._prepared()
+
+    def _get_quote(self):
+        try:
+            self.quote = self.api_client.get(f"quotes/{self.quote_id}")
+        except Exception as e:
+            log.error(f"Could not get quote by id: {e}")
+            raise
+
+    def _generate_quote(self, slippage_percent):
+        log.debug("Generating a default quote...")
+        quotes = self.api_client.post(
+            "quotes", data=self._quote_body(slippage_percent))
+        return self._pick_quote(quotes)
+
+    def submit(self):
+        serialized, coid = self._submission()
+        if serialized is None:
+            return self.journal.result(coid)
+
+        log.debug("Sending raw order details: %s", serialized)
+        try:
+            result = self.api_client.post("orders", serialized)
+        except DexibleException as e:
+            self._rejected(coid, e)
+            raise
+        return self._submitted(coid, result)
+
+
+class SyncOrderWrapper(OrderWrapper):
+    """OrderWrapper with blocking methods. Bulk actions run on a thread
+    pool sharing the client's connection pool.
+    """
+
+    def prepare(self, token_in, token_out, amount_in, algo, tags):
+        order = SyncDexOrder(api_client=self.api_client,
+                             token_in=token_in,
+                             token_out=token_out,
+                             amount_in=amount_in,
+                             algo=algo,
+                             max_rounds=algo.max_rounds,
+                             tags=tags,
+                             tag_index=self.tag_index,
+                             journal=self.journal)
+        return order.prepare()
+
+    def prepare_batch(self, specs, ledger=None, owner=None, resize=False):
+        """Prepare several orders one after another against a shared
+        budget. See OrderWrapper.prepare_batch.
+        """
+        if owner is None:
+            owner = self.api_client.account.address
+        if ledger is None:
+            ledger = BudgetLedger()
+            ledger.load_orders(owner, self.iter_all(state="all"))
+
+        results = []
+        for spec in specs:
+            try:
+                with self._charged(ledger, owner, spec, resize) as kwargs:
+                    results.append(self.prepare(**kwargs))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def get_all(self, limit=100, offset=0, state="all"):
+        return self.api_client.get(_orders_path(limit, offset, state))
+
+    def iter_all(self, page_size=100, offset=0, state="all"):
+        """Iterate over every order, one page at a time. See
+        OrderWrapper.iter_all.
+        """
+        assert(state in ["all", "active"])
+        assert(page_size > 0)
+        while offset is not None:
+            records, offset = self._page(self.get_all(limit=page_size,
+                                                      offset=offset,
+                                                      state=state),
+                                         page_size, offset)
+            yield from records
+
+    def get_one(self, id):
+        return self._order_record(self.api_client.get(_order_path(id)))
+
+    def cancel(self, id):
+        return self.api_client.post(*_action_request("cancel", id))
+
+    def pause(self, id):
+        return self.api_client.post(*_action_request("pause", id))
+
+    def resume(self, id):
+        return self.api_client.post(*_action_request("resume", id))
+
+    def cancel_many(self, ids=None, where=None, concurrency=16):
+        """Cancel several orders. See OrderWrapper.cancel_many."""
+        return self.bulk({"cancel": self._resolve_ids(ids, where)},
+                         concurrency=concurrency)["cancel"]
+
+    def pause_many(self, ids=None, where=None, concurrency=16):
+        """Pause several orders. See OrderWrapper.cancel_many."""
+        return self.bulk({"pause": self._resolve_ids(ids, where)},
+                         concurrency=concurrency)["pause"]
+
+    def resume_many(self, ids=None, where=None, concurrency=16):
+        """Resume several orders. See OrderWrapper.cancel_many."""
+        return self.bulk({"resume": self._resolve_ids(ids, where)},
+                         concurrency=concurrency)["resume"]
+
+    def bulk(self, actions, concurrency=16):
+        """Run cancel/pause/resume actions over many orders on up to
+        concurrency threads. See OrderWrapper.bulk.
+        """
+        assert(concurrency > 0)
+        outcomes, jobs = self._bulk_jobs(actions)
+        if len(jobs) == 0:
+            return outcomes
+
+        def run(job):
+            action, id = job
+            try:
+                return getattr(self, action)(id)
+            except Exception as e:
+                return self._bulk_failed(action, id, e)
+
+        # map() hands out jobs in order, so cancels still go first
+        with ThreadPoolExecutor(min(concurrency, len(jobs))) as executor:
+            for (action, id), outcome in zip(jobs, executor.map(run, jobs)):
+                outcomes[action][id] = outcome
+        return outcomes
+
+    def _resolve_ids(self, ids, where):
+        ids = self._given_ids(ids, where)
+        if ids is None:
+            ids = [record["id"] for record in self.iter_all(state="active")
+                   if where(record)]
+        return ids
+
+
+class SyncQuoteWrapper(QuoteWrapper):
+
+    def get_quote(self, token_in, token_out, amount_in, slippage_percent,
+                  max_rounds=None, max_fixed_gas=None, fixed_price=None):
+        return self.api_client.post("quotes", data=quote_body(
+            self.api_client.chain_id, token_in, token_out, amount_in,
+            slippage_percent, max_rounds=max_rounds,
+            max_fixed_gas=max_fixed_gas, fixed_price=fixed_price))
+
+
+class SyncTokenSupport(TokenSupport):
+
+    def lookup(self, address):
+        try:
+            verified = self.verify(address)
+        except DexibleException as e:
+            raise self._unsupported(address, e.json_response) from e
+        return self.tokenhelper.load(**self._find_args(address, verified))
+
+    def increase_spending(self, token, amount):
+        tx_id = self.tokenhelper.approve(provider=self.provider,
+                                         chain_id=self.chain_id,
+                                         account=self.account,
+                                         token=token,
+                                         amount=amount)
+        return self._confirm_spending(tx_id, token, amount)
+
+    def verify(self, address):
+        return self.api_client.get(self._verify_path(address))
+
+
+class SyncContact(Contact):
+
+    def add(self, email):
+        return self.api_client.post(*self._add_request(email))
+
+    def get_all(self):
+        return self.api_client.get(self._path)
+
+    def toggle(self, id):
+        return self.api_client.post(*self._toggle_request(id))
+
+
+class SyncReports(Reports):
+
+    def get_summary_delta(self, start, delta, columnar=False, **kwargs):
+        """See Reports.get_summary_delta."""
+        return self.get_summary_between(start, (start + delta),
+                                        columnar=columnar, **kwargs)
+
+    def get_summary_between(self, start, end, columnar=False, amounts=None,
+                            token_decimals=None, chunk=None):
+        """See Reports.get_summary_between. With chunk, the sub-windows are
+        fetched one after another.
+        """
+        if chunk is None:
+            payload = self.api_client.post(*self._summary_request(start, end))
+        else:
+            payload = list(self.iter_summary(start, end, chunk))
+        return self._summary(payload, chunk is not None, columnar, amounts,
+                             token_decimals)
+
+    def iter_summary(self, start, end, chunk, order_id_column="orderId"):
+        """Stream the report summary of a long window as row dicts, one
+        sub-window of length chunk at a time. See Reports.iter_summary.
+        """
+        windows = _WindowRows(order_id_column)
+        for lo, hi in self._summary_windows(start, end, chunk):
+            yield from windows.rows(self.get_summary_between(lo, hi))
+
+
+class DexibleSyncSDK:
+    """Blocking counterpart of DexibleSDK for scripts and sync services.
+
+    Requests go through a pooled requests.Session, so no event loop is
+    involved. The order, quote, token, contact and reports wrappers have the
+    methods of DexibleSDK's, as plain blocking calls. With a journal, pending
+    submissions are resolved with OrderJournal.reconcile_blocking.
+
+    Example:
+        sdk = DexibleSyncSDK(provider, account, chain_id)
+        quote = sdk.quote.get_quote(token_in=..., ...)
+        for record in sdk.order.iter_all(state="active"):
+            ...
+    """
+    GasPolicyTypes = DexibleSDK.GasPolicyTypes
+
+    def __init__(self, provider, account, chain_id,
+                 network='ethereum', pool_size=10, journal=None):
+        self.account = account
+        self.provider = provider
+        self.chain_id = chain_id
+        self.api_client = APIClient(chain_id=chain_id,
+                                    network=network,
+                                    account=account,
+                                    pool_size=pool_size)
+        self.algo = AlgoWrapper()
+        self.token = SyncTokenSupport(provider=provider,
+                                      account=account,
+                                      api_client=self.api_client,
+                                      chain_id=chain_id)
+        self.order = SyncOrderWrapper(self.api_client, journal=journal)
+        self.quote = SyncQuoteWrapper(self.api_client)
+        self.contact = SyncContact(self.api_client)
+        self.reports = SyncReports(self.api_client)
+
+    def close(self):
+        self.api_client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
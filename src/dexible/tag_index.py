@@ -0,0 +1,113 @@
+import json
+import logging
+from collections import OrderedDict
+
+log = logging.getLogger('TagIndex')
+
+CLIENT_ORDER_ID = "client_order_id"
+
+
+def tag_key(name, value):
+    """Hashable key of a tag; unhashable values are keyed by their JSON."""
+    try:
+        hash(value)
+    except TypeError:
+        value = json.dumps(value, sort_keys=True)
+    return (name, value)
+
+
+def _order_id(record):
+    if not isinstance(record, dict):
+        return None
+    if "id" in record:
+        return record["id"]
+    if "orderId" in record:
+        return record["orderId"]
+    if type(record.get("order")) == dict:
+        return _order_id(record["order"])
+    return None
+
+
+class TagIndex:
+    """Maps (tag name, tag value) pairs to the id of the order carrying that
+    tag.
+
+    Populated from order submissions and from every page returned by
+    OrderWrapper.iter_all, so reconciling by client order id does not require
+    scanning the order history. When several orders share a tag, the most
+    recently indexed one wins.
+
+    Only the ids are kept by default, so streaming a long order history
+    costs one small entry per tag. Set max_records to also keep the most
+    recently indexed records, least recently used first out.
+    """
+
+    def __init__(self, max_records=0):
+        """
+        Args:
+            max_records (int): Number of full order records to keep for
+                get(). 0 keeps none, None keeps every record.
+        """
+        self.max_records = max_records
+        self.order_ids = {}
+        self.records = OrderedDict()
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    def add(self, record):
+        """Index an order record as returned by the orders endpoint."""
+        order_id = _order_id(record)
+        tags = record.get("tags") if isinstance(record, dict) else None
+        if order_id is None or not tags:
+            return
+        self._index(order_id, tags, record)
+
+    def add_submitted(self, tags, response):
+        """Index a freshly submitted order from its tags and the submit
+        response.
+        """
+        order_id = _order_id(response)
+        if order_id is None:
+            log.debug(f"No order id in submit response: {response}")
+            return
+        record = response.get("order", response)
+        if isinstance(record, dict) and "tags" not in record:
+            record = dict(record, tags=tags)
+        self._index(order_id, tags or [], record)
+
+    def _index(self, order_id, tags, record):
+        for tag in tags:
+            self.order_ids[tag_key(tag.get("name"), tag.get("value"))] = \
+                order_id
+        if self.max_records == 0:
+            return
+        self.records[order_id] = record
+        self.records.move_to_end(order_id)
+        if self.max_records is not None:
+            while len(self.records) > self.max_records:
+                self.records.popitem(last=False)
+
+    def discard(self, order_id):
+        """Forget an order. Scans every indexed tag."""
+        self.records.pop(order_id, None)
+        for key in [k for k, v in self.order_ids.items() if v == order_id]:
+            del self.order_ids[key]
+
+    def lookup(self, name, value):
+        """Returns the id of the order tagged with name=value, or None."""
+        return self.order_ids.get(tag_key(name, value))
+
+    def get(self, name, value):
+        """Returns the record of the order tagged with name=value, or None
+        when no order has the tag or its record is not kept (see
+        max_records).
+        """
+        order_id = self.order_ids.get(tag_key(name, value))
+        if order_id is None or order_id not in self.records:
+            return None
+        self.records.move_to_end(order_id)
+        return self.records[order_id]
+
+    def by_client_order_id(self, client_order_id):
+        return self.get(CLIENT_ORDER_ID, client_order_id)
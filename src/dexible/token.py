@@ -1,11 +1,81 @@
-import web3
+import asyncio
 import time
-import eth_abi.exceptions
-from web3.middleware import construct_sign_and_send_raw_middleware
-from .abi import ERC20_ABI, MULTICALL_ABI
+from . import abi
 from .common import CHAIN_CONFIG, Token
 from .exceptions import *
 
+# web3 and eth_abi are imported inside the methods that talk to the chain, so
+# that importing the SDK does not pay for them up front
+
+# Seconds to wait after an approval is mined before trusting the allowance,
+# so the network can propagate it, as with the original sdk
+SPENDING_PROPAGATION_DELAY = 30
+
+
+async def _off_loop(fn, *args):
+    # web3 calls block; run them on the default executor so that the event
+    # loop keeps serving other requests meanwhile
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, fn, *args)
+
+
+def multicall_contract(w3, chain_id):
+    """The chain's Multicall contract, per CHAIN_CONFIG."""
+    return w3.eth.contract(
+        abi=abi.MULTICALL_ABI,
+        address=w3.toChecksumAddress(CHAIN_CONFIG[chain_id]["Multicall"]))
+
+
+def multicall_results(w3, multicall, calls):
+    """Run contract reads as one Multicall aggregate call, undecoded.
+
+    Args:
+        w3 (web3.Web3): Web3 instance.
+        multicall: Multicall contract, see multicall_contract.
+        calls (list): Dicts with "abi", "contract", "address", "method" and
+            "args" of each read.
+
+    Returns:
+        list: Raw return data of each call, in order.
+    """
+    return multicall.functions.aggregate(
+        [[w3.toChecksumAddress(c["address"]),
+          c["contract"].encodeABI(fn_name=c["method"],
+                                  args=c["args"])]
+         for c in calls]
+    ).call()[1]
+
+
+def decode_result(w3, call, data):
+    """Decode the return data of one call, see multicall_results.
+
+    Raises:
+        eth_abi.exceptions.DecodingError: The data does not match the
+            call's output types.
+    """
+    import web3
+    fn_abi = web3._utils.contracts.find_matching_fn_abi(
+        call["abi"], w3.codec, call["method"], call["args"])
+    output_types = web3._utils.abi.get_abi_output_types(fn_abi)
+    return w3.codec.decode_abi(output_types, data)
+
+
+def multicall_aggregate(w3, multicall, calls):
+    """Run contract reads as one Multicall aggregate call.
+
+    Args:
+        w3 (web3.Web3): Web3 instance.
+        multicall: Multicall contract, see multicall_contract.
+        calls (list): Dicts with "abi", "contract", "address", "method" and
+            "args" of each read.
+
+    Returns:
+        list: Decoded output tuple of each call, in order.
+    """
+    return [decode_result(w3, call, data) for call, data in
+            zip(calls, multicall_results(w3, multicall, calls))]
+
+
 class TokenException(Exception):
     pass
 
@@ -16,11 +86,18 @@ class TokenHelper:
     async def find(self, provider, chain_id, address, owner=None):
         if address.lower() in self.cache:
             return self.cache[address.lower()]
+        return await _off_loop(self.load, provider, chain_id, address, owner)
+
+    def load(self, provider, chain_id, address, owner=None):
+        """Blocking form of find()."""
+        if address.lower() in self.cache:
+            return self.cache[address.lower()]
+        import eth_abi.exceptions
         try:
-            info = await self.get_info(provider,
-                                       chain_id,
-                                       address,
-                                       owner=owner)
+            info = self.read_info(provider,
+                                  chain_id,
+                                  address,
+                                  owner=owner)
         except eth_abi.exceptions.InsufficientDataBytes:
             raise TokenException(f"Can't resolve token at {address}")
 
@@ -29,15 +106,18 @@ class TokenHelper:
         return token
 
     async def get_info(self, provider, chain_id, address, owner=None):
+        return await _off_loop(self.read_info, provider, chain_id, address,
+                               owner)
+
+    def read_info(self, provider, chain_id, address, owner=None):
+        import web3
+        ERC20_ABI = abi.ERC20_ABI
         w3 = web3.Web3(provider)
         erc20 = w3.eth.contract(abi=ERC20_ABI)  # Generic ERC20 Contract
-        # Multicall contract address
-        mc_adddress = CHAIN_CONFIG[chain_id]["Multicall"]
         # Settlement contract address
         settlement_address = CHAIN_CONFIG[chain_id]["Settlement"]
         # Multicall contract on chain
-        multicall = w3.eth.contract(abi=MULTICALL_ABI,
-                                    address=w3.toChecksumAddress(mc_adddress))
+        multicall = multicall_contract(w3, chain_id)
 
         calls = [{"abi": ERC20_ABI,
                   "contract": erc20,
@@ -67,35 +147,28 @@ class TokenHelper:
                  "args": [owner, settlement_address],
                  "target": "allowance"})
 
-        results = multicall.functions.aggregate(
-            [[w3.toChecksumAddress(c["address"]),
-              c["contract"].encodeABI(fn_name=c["method"],
-                                      args=c["args"])]
-             for c in calls]
-        ).call()
-
-        callnr = 0
         returndict = {}
-        for call in calls:
-            fn_abi = web3._utils.contracts.find_matching_fn_abi(
-                call["abi"], w3.codec, call["method"], call["args"])
-            output_types = web3._utils.abi.get_abi_output_types(fn_abi)
-            decoded = w3.codec.decode_abi(output_types, results[1][callnr])
-
-            call["result"] = decoded
-            returndict[call["target"]] = call["result"][0]
-            callnr += 1
+        for call, decoded in zip(calls, multicall_aggregate(w3, multicall,
+                                                            calls)):
+            returndict[call["target"]] = decoded[0]
 
         return returndict
 
     async def increase_spending(self, provider, chain_id,
                                 account, token, amount):
+        return await _off_loop(self.approve, provider, chain_id, account,
+                               token, amount)
+
+    def approve(self, provider, chain_id, account, token, amount):
+        """Blocking form of increase_spending()."""
+        import web3
+        from web3.middleware import construct_sign_and_send_raw_middleware
         w3 = web3.Web3(provider)
         w3.middleware_onion.add(
             construct_sign_and_send_raw_middleware(account))
         w3.eth.default_account = account.address
         token_contract = w3.eth.contract(
-            abi=ERC20_ABI,
+            abi=abi.ERC20_ABI,
             address=w3.toChecksumAddress(token.address))
         # Settlement contract address
         settlement_address = CHAIN_CONFIG[chain_id]["Settlement"]
@@ -120,19 +193,27 @@ class TokenSupport:
 
     async def lookup(self, address):
         try:
-            r = await self.verify(address)
-            if not r:
-                raise DexibleException(f"Bad status code: {r}")
-        except:
-            raise DexibleException("Unsupported token address: " + address)
-
+            verified = await self.verify(address)
+        except DexibleException as e:
+            raise self._unsupported(address, e.json_response) from e
+        return await self.tokenhelper.find(**self._find_args(address,
+                                                             verified))
+
+    def _unsupported(self, address, response):
+        return DexibleException("Unsupported token address: " + address,
+                                json_response=response)
+
+    def _find_args(self, address, verified):
+        # Arguments of the token lookup once the API answered the token
+        # verification; shared with the blocking SDK
+        if not verified:
+            raise self._unsupported(address, verified)
         if self.address is None:
             self.address = self.account.address
-
-        return await self.tokenhelper.find(provider=self.provider,
-                                           chain_id=self.chain_id,
-                                           address=address,
-                                           owner=self.address)
+        return {"provider": self.provider,
+                "chain_id": self.chain_id,
+                "address": address,
+                "owner": self.address}
 
     async def increase_spending(self, token, amount):
         tx_id = await self.tokenhelper.increase_spending(
@@ -141,16 +222,30 @@ class TokenSupport:
             account=self.account,
             token=token,
             amount=amount)
+        await _off_loop(self._wait_for_receipt, tx_id)
+        await asyncio.sleep(SPENDING_PROPAGATION_DELAY)
+        return self._spending_confirmed(tx_id, token, amount)
+
+    def _confirm_spending(self, tx_id, token, amount):
+        # Blocking form of the confirmation in increase_spending()
+        self._wait_for_receipt(tx_id)
+        time.sleep(SPENDING_PROPAGATION_DELAY)
+        return self._spending_confirmed(tx_id, token, amount)
+
+    def _wait_for_receipt(self, tx_id):
+        import web3
         w3 = web3.Web3(self.provider)
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_id)
         if not tx_receipt.status:
             raise Exception("Allowance transaction failed.")
-        # Wait for 30s to allow network to propagate, as with original sdk
-        time.sleep(30)
+
+    def _spending_confirmed(self, tx_id, token, amount):
         token.allowance = amount
         self.tokenhelper.invalidate_cache_for(token.address)
         return tx_id
 
     async def verify(self, address):
-        return await self.api_client.get(
-            f"token/verify/{self.chain_id}/{address}")
+        return await self.api_client.get(self._verify_path(address))
+
+    def _verify_path(self, address):
+        return f"token/verify/{self.chain_id}/{address}"
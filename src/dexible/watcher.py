@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import math
+import time
+import dexible.policy as policy
+
+log = logging.getLogger('OrderWatcher')
+
+
+class OrderEvent:
+    def __init__(self, order_id, old_state, new_state, record):
+        self.order_id = order_id
+        self.old_state = old_state
+        self.new_state = new_state
+        self.record = record
+
+    def __str__(self):
+        return f"<OrderEvent {self.order_id} " \
+            f"{self.old_state} -> {self.new_state}>"
+    __repr__ = __str__
+
+
+class _Watched:
+    def __init__(self, order_id, interval, due):
+        self.order_id = order_id
+        self.state = None
+        self.interval = interval
+        self.due = due
+
+
+def _twap_round_seconds(record):
+    # TWAP orders can fill once per round, so backing off past the round
+    # spacing would miss fills
+    if not isinstance(record, dict):
+        return None
+    rounds = record.get("maxRounds") or \
+        (record.get("quote") or {}).get("rounds")
+    if not rounds:
+        return None
+    for p in record.get("policies") or []:
+        if type(p) == dict and p.get("type") == policy.BoundedDelay.tag:
+            window = (p.get("params") or {}).get("timeWindow")
+            if window:
+                return window / rounds
+    return None
+
+
+class OrderWatcher:
+    """Polls a set of orders and reports state transitions.
+
+    Each order is polled on its own interval. The interval drops back to
+    min_interval whenever the order changes state and grows by backoff after
+    each unchanged poll, up to max_interval (or the TWAP round spacing, when
+    smaller). When enough orders are due at once, a single pass over
+    orders?state=active replaces the individual get_one calls.
+
+    An order whose poll fails keeps its state and is retried on the same
+    growing interval, so one bad order neither stalls the loop nor gets
+    polled in a tight retry.
+
+    Transitions are passed to every registered callback (plain functions or
+    coroutines) and put on the optional asyncio queue.
+    """
+    STATE_FIELD = "state"
+
+    def __init__(self, order_wrapper, min_interval=2, max_interval=60,
+                 backoff=1.5, page_size=100, queue=None):
+        """
+        Args:
+            order_wrapper (OrderWrapper): Wrapper used to poll orders.
+            min_interval (float): Shortest polling interval, in seconds.
+            max_interval (float): Longest polling interval, in seconds.
+            backoff (float): Interval multiplier after an unchanged poll.
+            page_size (int): Page size for the active-orders listing.
+            queue (asyncio.Queue): Optional queue receiving OrderEvents.
+        """
+        self.order_wrapper = order_wrapper
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.page_size = page_size
+        self.queue = queue
+        self.callbacks = []
+        self.watched = {}
+        self.active_count = 0
+        self._task = None
+        self._callback_tasks = set()
+        self._wakeup = asyncio.Event()
+
+    def on_change(self, callback):
+        self.callbacks.append(callback)
+        return callback
+
+    def watch(self, order_id):
+        if order_id not in self.watched:
+            self.watched[order_id] = _Watched(order_id,
+                                              self.min_interval,
+                                              time.monotonic())
+            self._wakeup.set()
+
+    def unwatch(self, order_id):
+        self.watched.pop(order_id, None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            if len(self.watched) == 0:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            next_due = min(w.due for w in self.watched.values())
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.poll_due()
+            except Exception as e:
+                # never leave an order due, or the loop would spin on it
+                log.error(f"Problem polling orders: {e}")
+                now = time.monotonic()
+                for w in list(self.watched.values()):
+                    if w.due <= now:
+                        self._failed(w, e)
+
+    async def poll_due(self):
+        """Poll every order whose interval has elapsed.
+
+        Failures are handled per order; every due order is rescheduled
+        whether its poll succeeded or not.
+        """
+        now = time.monotonic()
+        due = [w for w in self.watched.values() if w.due <= now]
+        if len(due) == 0:
+            return
+
+        pages = max(1, math.ceil(self.active_count / self.page_size))
+        if len(due) > pages:
+            log.debug(f"Polling {len(due)} due orders through "
+                      f"{pages} page(s) of active orders")
+            try:
+                await self._poll_active(due)
+            except Exception as e:
+                log.error(f"Problem listing active orders, polling them "
+                          f"one by one: {e}")
+                for w in due:
+                    if w.due <= now:
+                        await self._poll_one(w)
+        else:
+            for w in due:
+                await self._poll_one(w)
+
+    async def _poll_one(self, w):
+        try:
+            record = await self.order_wrapper.get_one(w.order_id)
+        except Exception as e:
+            self._failed(w, e)
+            return
+        self._observe(w, record)
+
+    async def _poll_active(self, due):
+        remaining = {str(w.order_id): w for w in due}
+        count = 0
+        async for record in self.order_wrapper.iter_all(
+                page_size=self.page_size, state="active"):
+            count += 1
+            w = remaining.pop(str(record.get("id")), None)
+            if w is not None:
+                self._observe(w, record)
+        self.active_count = count
+
+        # Anything missing from the active listing has left the active
+        # state; fetch it to learn where it went
+        for w in remaining.values():
+            await self._poll_one(w)
+
+    def _failed(self, w, error):
+        w.interval = min(w.interval * self.backoff, self.max_interval)
+        w.due = time.monotonic() + w.interval
+        log.error(f"Problem polling order {w.order_id}, retrying in "
+                  f"{w.interval:.1f}s: {error}")
+
+    def _observe(self, w, record):
+        new_state = record.get(self.STATE_FIELD) \
+            if isinstance(record, dict) else None
+        old_state = w.state
+        w.state = new_state
+        if old_state != new_state:
+            w.interval = self.min_interval
+            if old_state is not None:
+                self._emit(OrderEvent(w.order_id, old_state, new_state,
+                                      record))
+        else:
+            w.interval = min(w.interval * self.backoff, self.max_interval)
+        round_seconds = _twap_round_seconds(record)
+        if round_seconds:
+            w.interval = min(w.interval,
+                             max(round_seconds / 2, self.min_interval))
+        w.due = time.monotonic() + w.interval
+
+    def _emit(self, event):
+        log.debug(f"Order state changed: {event}")
+        if self.queue is not None:
+            self.queue.put_nowait(event)
+        for cb in self.callbacks:
+            try:
+                r = cb(event)
+            except Exception as e:
+                log.error(f"Callback {cb} failed: {e}")
+                continue
+            if asyncio.iscoroutine(r):
+                # the loop only keeps weak references to tasks
+                task = asyncio.ensure_future(r)
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task):
+        self._callback_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f"Callback failed: {task.exception()}")
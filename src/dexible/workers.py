@@ -0,0 +1,341 @@
+"""Prefork worker mode: order preparation and submission sharded across
+processes.
+
+Forked children inherit the parent's open HTTP sessions and class-level
+caches in whatever state they were in. The first ShardedDispatcher.start()
+registers an after-fork hook that clears them in the child, and every
+worker builds its own SDK (and so its own transports) after the fork.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import zlib
+from collections.abc import MutableMapping
+import dexible.algo as algos
+from .exceptions import DexibleException
+from .pool import AccountPool
+from .token import TokenHelper
+
+log = logging.getLogger('Workers')
+
+_AFTER_FORK = []
+_fork_hook_registered = False
+
+
+def after_fork(fn):
+    """Register fn to run in every child process right after a fork, once a
+    ShardedDispatcher has been started.
+
+    Usable as a decorator. Hooks run in registration order, after the SDK's
+    own caches have been reset.
+    """
+    _AFTER_FORK.append(fn)
+    return fn
+
+
+def _after_fork_in_child():
+    # Token snapshots carry the parent's balances; start clean
+    TokenHelper.cache.clear()
+    for fn in _AFTER_FORK:
+        try:
+            fn()
+        except Exception as e:
+            log.error(f"After-fork hook {fn} failed: {e}")
+
+
+def _register_fork_hook():
+    # Registered on first use rather than at import, so merely importing the
+    # module does not touch every fork of the host process
+    global _fork_hook_registered
+    if _fork_hook_registered or not hasattr(os, "register_at_fork"):
+        return
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+    _fork_hook_registered = True
+
+
+class SharedMetadataCache(MutableMapping):
+    """Read-mostly cache of token metadata shared by worker processes.
+
+    Reads are served from a per-process dict first and fall back to a
+    multiprocessing.Manager dict shared by all processes; writes go to both.
+    A token's metadata is therefore read over RPC once for the whole fleet
+    and costs one IPC round trip per process after that.
+
+    Assign it to AccountPool.metadata to share the pool's token cache. A
+    plain DexibleSDK does not use it: sdk.token lookups go through the
+    per-process TokenHelper cache, whose Tokens carry one owner's balance
+    and allowance and so are not shared.
+    """
+
+    def __init__(self, manager):
+        self.local = {}
+        self.shared = manager.dict()
+
+    def __getitem__(self, key):
+        try:
+            return self.local[key]
+        except KeyError:
+            value = self.shared[key]
+            self.local[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        self.local[key] = value
+        self.shared[key] = value
+
+    def __delitem__(self, key):
+        self.local.pop(key, None)
+        del self.shared[key]
+
+    def __contains__(self, key):
+        if key in self.local:
+            return True
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.shared.keys())
+
+    def __len__(self):
+        return len(self.shared)
+
+
+def shard_of(key, shards):
+    """Stable shard index of a key; the same in every process."""
+    return zlib.crc32(str(key).lower().encode()) % shards
+
+
+async def _prepare_and_submit(target, spec):
+    account = spec.get("account")
+    if isinstance(target, AccountPool):
+        sdk = target[account]
+        token_in = await target.lookup(sdk.account.address, spec["token_in"])
+        token_out = await target.lookup(sdk.account.address,
+                                        spec["token_out"])
+    else:
+        sdk = target
+        token_in = await sdk.token.lookup(spec["token_in"])
+        token_out = await sdk.token.lookup(spec["token_out"])
+    algo = algos.from_json(**spec["algo"])
+    order = await sdk.order.prepare(token_in=token_in,
+                                    token_out=token_out,
+                                    amount_in=spec["amount_in"],
+                                    algo=algo,
+                                    tags=spec.get("tags") or [])
+    return await order.submit()
+
+
+def _error(e):
+    message = getattr(e, "message", None) or str(e)
+    return f"{type(e).__name__}: {message}"
+
+
+def _worker(factory, inbox, outbox, metadata):
+    target = None
+    loop = asyncio.new_event_loop()
+    try:
+        target = factory()
+        if isinstance(target, AccountPool):
+            if metadata is not None:
+                target.metadata = metadata
+            loop.run_until_complete(target.open())
+        setup_error = None
+    except Exception as e:
+        # keep answering so the dispatcher is not left waiting
+        log.error(f"Worker setup failed: {e}")
+        setup_error = f"Worker setup failed: {_error(e)}"
+    try:
+        while True:
+            item = inbox.get()
+            if item is None:
+                break
+            index, spec = item
+            if setup_error is not None:
+                outbox.put((index, False, setup_error))
+                continue
+            try:
+                result = loop.run_until_complete(
+                    _prepare_and_submit(target, spec))
+                outbox.put((index, True, result))
+            except Exception as e:
+                outbox.put((index, False, _error(e)))
+    finally:
+        if isinstance(target, AccountPool):
+            loop.run_until_complete(target.close())
+        loop.close()
+
+
+class ShardedDispatcher:
+    """Prepares and submits orders on a fixed set of forked workers.
+
+    Each order goes to the worker owning its shard, chosen by account or by
+    (token in, token out) pair. Orders for the same account or pair are
+    therefore always handled in submission order by one process, and each
+    worker only keeps the state of its own shard warm.
+
+    The factory runs once in every worker, after the fork. It returns a
+    DexibleSDK, or an AccountPool when orders carry an "account". If it
+    raises, every order sent to that worker fails with the error; a worker
+    that dies fails its outstanding orders instead of stalling run().
+
+    Example:
+        def factory():
+            return DexibleSDK(provider, account, chain_id)
+
+        with ShardedDispatcher(factory, processes=4,
+                               shard_by="pair") as dispatcher:
+            results = dispatcher.run(specs)
+    """
+    SHARD_KEYS = ["account", "pair"]
+
+    def __init__(self, factory, processes=None, shard_by="account",
+                 metadata=None, poll_interval=1.0):
+        """
+        Args:
+            factory: Callable building the worker's DexibleSDK or
+                AccountPool.
+            processes (int): Number of workers. Defaults to the CPU count.
+            shard_by (str): "account" or "pair".
+            metadata (SharedMetadataCache): Token metadata cache handed to
+                AccountPool workers; DexibleSDK workers do not use it. One
+                is created when omitted.
+            poll_interval (float): Seconds between worker liveness checks
+                while run() waits for results.
+        """
+        if shard_by not in self.SHARD_KEYS:
+            raise DexibleException(f"Unsupported shard key: {shard_by}")
+        self.factory = factory
+        self.processes = processes or os.cpu_count() or 1
+        self.shard_by = shard_by
+        self.metadata = metadata
+        self.poll_interval = poll_interval
+        self.manager = None
+        self.workers = []
+        self.inboxes = []
+        self.outbox = None
+
+    def start(self):
+        if len(self.workers) > 0:
+            return
+        _register_fork_hook()
+        ctx = multiprocessing.get_context("fork")
+        if self.metadata is None:
+            self.manager = ctx.Manager()
+            self.metadata = SharedMetadataCache(self.manager)
+        self.outbox = ctx.Queue()
+        for i in range(self.processes):
+            inbox = ctx.Queue()
+            worker = ctx.Process(target=_worker,
+                                 args=(self.factory, inbox, self.outbox,
+                                       self.metadata),
+                                 name=f"dexible-worker-{i}",
+                                 daemon=True)
+            worker.start()
+            self.inboxes.append(inbox)
+            self.workers.append(worker)
+        log.debug(f"Started {self.processes} workers sharded by "
+                  f"{self.shard_by}")
+
+    def stop(self):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        self.inboxes = []
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+            self.metadata = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def shard_key(self, spec):
+        if self.shard_by == "account":
+            return spec.get("account")
+        return f"{getattr(spec['token_in'], 'address', spec['token_in'])}:" \
+            f"{getattr(spec['token_out'], 'address', spec['token_out'])}"
+
+    def _message(self, spec):
+        # Only plain data crosses the process boundary
+        algo = spec["algo"]
+        if isinstance(algo, algos.DexibleBaseAlgorithm):
+            algo = {"name": algo.name,
+                    "policies": algo.serialize()["policies"],
+                    "max_rounds": algo.max_rounds}
+        return dict(spec,
+                    token_in=getattr(spec["token_in"], "address",
+                                     spec["token_in"]),
+                    token_out=getattr(spec["token_out"], "address",
+                                      spec["token_out"]),
+                    algo=algo)
+
+    def run(self, specs):
+        """Prepare and submit orders on the workers and wait for all.
+
+        Args:
+            specs (list): Dicts with token_in, token_out (addresses or
+                Tokens), amount_in, algo, optional tags and, for AccountPool
+                workers, account (owner address).
+
+        Returns:
+            list: Submit result of each order, in order, or a
+                DexibleException for orders that failed.
+        """
+        self.start()
+        results = [None] * len(specs)
+        pending = {}
+        for index, spec in enumerate(specs):
+            shard = shard_of(self.shard_key(spec), self.processes)
+            if not self.workers[shard].is_alive():
+                results[index] = self._dead(shard)
+                continue
+            pending[index] = shard
+            self.inboxes[shard].put((index, self._message(spec)))
+
+        while len(pending) > 0:
+            try:
+                self._settle(results, pending,
+                             self.outbox.get(timeout=self.poll_interval))
+                continue
+            except queue.Empty:
+                pass
+            dead = {shard for shard in set(pending.values())
+                    if not self.workers[shard].is_alive()}
+            if len(dead) == 0:
+                continue
+            for shard in dead:
+                log.error(f"Worker {self.workers[shard].name} exited with "
+                          f"code {self.workers[shard].exitcode}")
+            # collect whatever the dead workers sent before exiting
+            try:
+                while True:
+                    self._settle(results, pending,
+                                 self.outbox.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            for index, shard in list(pending.items()):
+                if shard in dead:
+                    results[index] = self._dead(shard)
+                    del pending[index]
+        return results
+
+    def _settle(self, results, pending, message):
+        index, ok, value = message
+        if pending.pop(index, None) is not None:
+            results[index] = value if ok else DexibleException(value)
+
+    def _dead(self, shard):
+        worker = self.workers[shard]
+        return DexibleException(f"Worker {worker.name} exited with code "
+                                f"{worker.exitcode}")
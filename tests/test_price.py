@@ -0,0 +1,35 @@
+from decimal import Decimal
+import pytest
+from dexible.common import Price, Token
+from dexible.exceptions import DexibleException
+
+numpy = pytest.importorskip("numpy")
+
+WETH = Token("0x1", 18, "WETH", None, None)
+USDC = Token("0x2", 6, "USDC", None, None)
+
+
+def test_batch_ndarray():
+    prices = Price.batch(WETH, USDC, numpy.int64(10**18),
+                         numpy.array([1000, 2000, 3000]) * 10**6)
+    assert [p.rate for p in prices] == [1000, 2000, 3000]
+    assert all(type(p.in_amount) is int for p in prices)
+
+
+def test_batch_units_ndarray():
+    prices = Price.batch_units(WETH, USDC, numpy.array([1.0, 0.1]), "2000")
+    assert [p.in_amount for p in prices] == [10**18, 10**17]
+    assert [p.out_amount for p in prices] == [2000 * 10**6] * 2
+
+
+def test_batch_length_mismatch():
+    with pytest.raises(DexibleException):
+        Price.batch(WETH, USDC, numpy.array([1, 2]), numpy.array([1, 2, 3]))
+
+
+def test_rate_follows_amounts():
+    price = Price(WETH, USDC, 10**18, 2000 * 10**6)
+    assert price.rate == 2000
+    price.out_amount = 1000 * 10**6
+    assert price.rate == 1000
+    assert price.inverse().rate == Decimal("0.001")